@@ -0,0 +1,80 @@
+import os
+import glob
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from schemavalidation import SchemaValidators, load_schema
+
+SCHEMA_FILE_NAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                                "standard229-ruleset-model-report.schema.json")
+
+# compiled once in each worker process by init_worker
+worker_validators = None
+
+
+def init_worker(schema_file_name):
+    global worker_validators
+    worker_validators = SchemaValidators(load_schema(schema_file_name))
+
+
+def validate_file(file_name):
+    start = time.perf_counter()
+    try:
+        with open(file_name, "r") as instance_file:
+            instance_229 = json.load(instance_file)
+    except (OSError, ValueError) as err:
+        errors = [{"path": "", "message": f"could not read instance: {err}"}]
+        parse_seconds = time.perf_counter() - start
+    else:
+        parse_seconds = time.perf_counter() - start
+        errors = worker_validators.errors(instance_229)
+    return {"file": file_name,
+            "valid": not errors,
+            "errors": errors,
+            "parse_seconds": parse_seconds,
+            "total_seconds": time.perf_counter() - start}
+
+
+def expand_file_names(file_patterns):
+    # file names or glob patterns, schema files are never treated as instances
+    file_names = []
+    for file_pattern in file_patterns:
+        if os.path.isdir(file_pattern):
+            file_pattern = os.path.join(file_pattern, "*.json")
+        for file_name in sorted(glob.glob(file_pattern, recursive=True)):
+            if not file_name.endswith(".schema.json") and file_name not in file_names:
+                file_names.append(file_name)
+    return file_names
+
+
+def validate_batch(file_patterns, summary_file_name, schema_file_name=SCHEMA_FILE_NAME, max_workers=None,
+                   chunksize=8):
+    file_names = expand_file_names(file_patterns)
+    valid_count = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker,
+                             initargs=(schema_file_name,)) as executor:
+        with open(summary_file_name, "w") as summary_file:
+            for result in executor.map(validate_file, file_names, chunksize=chunksize):
+                summary_file.write(json.dumps(result, default=str) + "\n")
+                if result["valid"]:
+                    valid_count += 1
+    elapsed = time.perf_counter() - start
+    return {"files": len(file_names),
+            "valid": valid_count,
+            "invalid": len(file_names) - valid_count,
+            "seconds": elapsed}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Validate RMR files against the Standard 229 schema in parallel.")
+    parser.add_argument("files", nargs="+", help="RMR files, directories or glob patterns")
+    parser.add_argument("--summary", default="validation-summary.jsonl", help="JSONL file with one result per RMR")
+    parser.add_argument("--schema", default=SCHEMA_FILE_NAME)
+    parser.add_argument("--workers", type=int, default=None)
+    arguments = parser.parse_args()
+    totals = validate_batch(arguments.files, arguments.summary, arguments.schema, arguments.workers)
+    print(f"{totals['files']} files validated in {totals['seconds']:.2f} s, "
+          f"{totals['valid']} valid and {totals['invalid']} invalid, summary in {arguments.summary}")
@@ -0,0 +1,178 @@
+# Timings of triplet creation, each rule, saving and schema validation on synthetic RMRs built from
+# the combined feasibility sample, so a slower change shows up before it is used on real models.
+import os
+import sys
+import copy
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+from rmrtriplet import PARSED_ORIGINS, RmrTriplet
+from ruleregistry import RULES
+from schemavalidation import SchemaValidators, load_schema
+
+TEMPLATE_FILE_NAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "combined-feasibility.user.json")
+SCHEMA_FILE_NAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                                "standard229-ruleset-model-report.schema.json")
+
+
+def synthetic_rmr(blocks, walls, systems, lights, template_file_name=TEMPLATE_FILE_NAME):
+    # items of the template are repeated in turn with unique names and tags
+    with open(template_file_name, "r") as template_file:
+        template = json.load(template_file)
+    template_blocks = template["Building"]["ThermalBlocks"]
+    template_walls = [wall for thermal_block in template_blocks for wall in thermal_block["ExteriorAboveGradeWalls"]]
+    template_systems = template["Building"]["HeatingVentilationAirConditioningSystems"]
+    template_lights = template["ExteriorLightingAreas"]
+
+    hvac_systems = []
+    for index in range(systems):
+        hvac_system = copy.deepcopy(template_systems[index % len(template_systems)])
+        hvac_system["tag"] = f"System{index:05d}"
+        hvac_systems.append(hvac_system)
+    thermal_blocks = []
+    for index in range(blocks):
+        thermal_block = copy.deepcopy(template_blocks[index % len(template_blocks)])
+        thermal_block["name"] = f"block_{index:05d}"
+        thermal_block["ExteriorAboveGradeWalls"] = [copy.deepcopy(template_walls[(index + wall_index) % len(template_walls)])
+                                                    for wall_index in range(walls)]
+        if hvac_systems:
+            thermal_block["served_by_heating_ventilation_air_conditioning_systems_tagged"] = \
+                [hvac_systems[index % len(hvac_systems)]["tag"]]
+        thermal_blocks.append(thermal_block)
+    exterior_lighting_areas = []
+    for index in range(lights):
+        exterior_lighting_area = copy.deepcopy(template_lights[index % len(template_lights)])
+        exterior_lighting_area["name"] = f"Lighting area {index:05d}"
+        exterior_lighting_areas.append(exterior_lighting_area)
+
+    template["test_id"] = f"synthetic-{blocks}-{walls}-{systems}-{lights}"
+    template["Building"]["ThermalBlocks"] = thermal_blocks
+    template["Building"]["HeatingVentilationAirConditioningSystems"] = hvac_systems
+    template["ExteriorLightingAreas"] = exterior_lighting_areas
+    return template
+
+
+def section_sizes(blocks, walls, systems, lights):
+    # elements behind each pointer a rule reads, used for the throughput of each phase
+    return {"/climate_zone": 0,
+            "/Building/ThermalBlocks": blocks * (1 + walls),
+            "/Building/HeatingVentilationAirConditioningSystems": systems,
+            "/ExteriorLightingAreas": lights}
+
+
+def run_phases(origin_file_name, triplet_root_name, validators, sizes, trace_memory=False):
+    phases = []
+
+    def measure(name, elements, function):
+        if trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        value = function()
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        phases.append({"phase": name, "elements": elements, "seconds": seconds, "peak_bytes": peak})
+        return value
+
+    total_elements = sum(sizes.values())
+    # the origin parsed by an earlier run is forgotten so each run times a cold load
+    PARSED_ORIGINS.clear()
+    rmr_triplet = measure("create triplet", total_elements, lambda: RmrTriplet(origin_file_name, triplet_root_name))
+    for rule_id, rule_to_run in RULES.items():
+        measure(f"rule {rule_id}", sum(sizes.get(pointer, 0) for pointer in rule_to_run.reads),
+                lambda: rmr_triplet.check_rules([rule_id], quiet=True))
+    measure("save instances", 3 * total_elements, rmr_triplet.save_instances)
+    if validators is not None:
+        for stage, file_name in [("user", rmr_triplet.user_file_name), ("proposed", rmr_triplet.proposed_file_name),
+                                 ("baseline", rmr_triplet.baseline_file_name)]:
+            def validate_file():
+                with open(file_name, "r") as instance_file:
+                    return validators.errors(json.load(instance_file))
+            measure(f"validate {stage}", total_elements, validate_file)
+    return phases
+
+
+def run_benchmark(blocks, walls, systems, lights, repeat=3, validate=True):
+    # best of repeat timings without tracing, then one traced run for the peak memory of each phase
+    sizes = section_sizes(blocks, walls, systems, lights)
+    validators = None
+    if validate:
+        start = time.perf_counter()
+        validators = SchemaValidators(load_schema(SCHEMA_FILE_NAME))
+        validators_seconds = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as work_dir:
+        origin_file_name = os.path.join(work_dir, "synthetic.user.json")
+        with open(origin_file_name, "w") as origin_file:
+            json.dump(synthetic_rmr(blocks, walls, systems, lights), origin_file, indent=2)
+        triplet_root_name = os.path.join(work_dir, "synthetic-benchmark")
+        runs = [run_phases(origin_file_name, triplet_root_name, validators, sizes) for _ in range(repeat)]
+        tracemalloc.start()
+        try:
+            traced = run_phases(origin_file_name, triplet_root_name, validators, sizes, trace_memory=True)
+        finally:
+            tracemalloc.stop()
+
+    phases = []
+    for index, traced_phase in enumerate(traced):
+        seconds = min(run[index]["seconds"] for run in runs)
+        elements = traced_phase["elements"]
+        phases.append({"phase": traced_phase["phase"],
+                       "elements": elements,
+                       "seconds": seconds,
+                       "elements_per_second": elements / seconds if seconds > 0 else None,
+                       "peak_bytes": traced_phase["peak_bytes"]})
+    if validate:
+        phases.insert(0, {"phase": "build validators", "elements": 0, "seconds": validators_seconds,
+                          "elements_per_second": None, "peak_bytes": None})
+    return {"blocks": blocks, "walls": walls, "systems": systems, "lights": lights, "repeat": repeat,
+            "python": sys.version.split()[0], "phases": phases}
+
+
+def regressions(report, previous_report, tolerance):
+    # phases that got slower than the previous report by more than the tolerance fraction
+    previous_seconds = {phase["phase"]: phase["seconds"] for phase in previous_report["phases"]}
+    slower = []
+    for phase in report["phases"]:
+        before = previous_seconds.get(phase["phase"])
+        if before and phase["seconds"] > before * (1 + tolerance):
+            slower.append((phase["phase"], before, phase["seconds"]))
+    return slower
+
+
+def print_report(report):
+    print(f"{report['blocks']} thermal blocks with {report['walls']} walls each, {report['systems']} HVAC systems, "
+          f"{report['lights']} exterior lighting areas, best of {report['repeat']}")
+    print(f"  {'phase':<20} {'seconds':>10} {'elements/s':>14} {'peak MiB':>10}")
+    for phase in report["phases"]:
+        rate = "" if phase["elements_per_second"] is None else f"{phase['elements_per_second']:,.0f}"
+        peak = "" if phase["peak_bytes"] is None else f"{phase['peak_bytes'] / 1048576:.1f}"
+        print(f"  {phase['phase']:<20} {phase['seconds']:>10.4f} {rate:>14} {peak:>10}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark rule checks and schema validation on synthetic RMRs.")
+    parser.add_argument("--blocks", type=int, default=200, help="thermal blocks")
+    parser.add_argument("--walls", type=int, default=4, help="exterior walls in each thermal block")
+    parser.add_argument("--systems", type=int, default=50, help="HVAC systems")
+    parser.add_argument("--lights", type=int, default=500, help="exterior lighting areas")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-validate", action="store_true", help="skip the schema validation phases")
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    parser.add_argument("--compare", help="JSON report of an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown as a fraction")
+    arguments = parser.parse_args()
+    benchmark_report = run_benchmark(arguments.blocks, arguments.walls, arguments.systems, arguments.lights,
+                                     arguments.repeat, not arguments.no_validate)
+    print_report(benchmark_report)
+    if arguments.output:
+        with open(arguments.output, "w") as output_file:
+            json.dump(benchmark_report, output_file, indent=2)
+    if arguments.compare:
+        with open(arguments.compare, "r") as compare_file:
+            slower_phases = regressions(benchmark_report, json.load(compare_file), arguments.tolerance)
+        for phase_name, before, after in slower_phases:
+            print(f"Regression in {phase_name}: {before:.4f} s before and {after:.4f} s now")
+        if slower_phases:
+            sys.exit(1)
@@ -0,0 +1,92 @@
+# Parsed RMRs kept in a binary file next to their JSON source, msgpack when it is installed and marshal
+# otherwise, both much faster to load than JSON text. A sidecar holds the size, modification time and
+# hash of the source it was made from and is used only while they still match, anything else falls
+# back to parsing the JSON. Sidecars are local caches: marshal data is not safe to load from untrusted
+# sources, so they should not be shared with files from elsewhere.
+import os
+import sys
+import json
+import struct
+import marshal
+
+from instancewriter import content_hash, file_hash, write_file
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+BINARY_CACHE_SUFFIX = ".rmrb"
+MAGIC = b"RMRB1\n"
+
+# sidecars are written when RMR_BINARY_CACHE is set to anything but 0, fresh ones are always read
+WRITE_BINARY_CACHE = os.environ.get("RMR_BINARY_CACHE", "") not in ("", "0")
+
+# marshal data is only read by the Python version that wrote it
+MARSHAL_CODEC = f"marshal-{marshal.version}-{sys.version_info[0]}.{sys.version_info[1]}"
+
+
+def sidecar_file_name(file_name):
+    return file_name + BINARY_CACHE_SUFFIX
+
+
+def encode_payload(instance):
+    if msgpack is not None:
+        try:
+            return "msgpack", msgpack.packb(instance, use_bin_type=True)
+        except (TypeError, ValueError, OverflowError):
+            # integers beyond 64 bits and the like
+            pass
+    return MARSHAL_CODEC, marshal.dumps(instance)
+
+
+def decode_payload(codec, payload):
+    if codec == "msgpack" and msgpack is not None:
+        return msgpack.unpackb(payload, raw=False)
+    if codec == MARSHAL_CODEC:
+        return marshal.loads(payload)
+    return None
+
+
+def read_sidecar(file_name):
+    # the instance in the sidecar of file_name if it was made from the file as it is now, otherwise None
+    try:
+        status = os.stat(file_name)
+        with open(sidecar_file_name(file_name), "rb") as sidecar_file:
+            if sidecar_file.read(len(MAGIC)) != MAGIC:
+                return None
+            header_length, = struct.unpack(">I", sidecar_file.read(4))
+            header = json.loads(sidecar_file.read(header_length))
+            if header["size"] != status.st_size:
+                return None
+            # a copied or touched file has a new time but the same content
+            if header["mtime_ns"] != status.st_mtime_ns and header["sha256"] != file_hash(file_name):
+                return None
+            return decode_payload(header["codec"], sidecar_file.read())
+    except (OSError, ValueError, EOFError, TypeError, KeyError, struct.error):
+        return None
+
+
+def write_sidecar(file_name, instance, source_hash, status):
+    codec, payload = encode_payload(instance)
+    header = json.dumps({"size": status.st_size, "mtime_ns": status.st_mtime_ns, "sha256": source_hash,
+                         "codec": codec}).encode("utf-8")
+    try:
+        write_file(sidecar_file_name(file_name), MAGIC + struct.pack(">I", len(header)) + header + payload, atomic=True)
+    except OSError:
+        # a directory that cannot be written only means no cache
+        pass
+
+
+def load_instance(file_name, write_sidecars=None):
+    # the parsed JSON of file_name, from its sidecar when that is fresh
+    instance = read_sidecar(file_name)
+    if instance is not None:
+        return instance
+    status = os.stat(file_name)
+    with open(file_name, "rb") as instance_file:
+        data = instance_file.read()
+    instance = json.loads(data)
+    if WRITE_BINARY_CACHE if write_sidecars is None else write_sidecars:
+        write_sidecar(file_name, instance, content_hash(data), status)
+    return instance
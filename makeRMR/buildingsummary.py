@@ -0,0 +1,33 @@
+# Aggregates of the thermal blocks of a building that several rules need, taken in one pass so a rule
+# reads them from the summary instead of walking the blocks and walls again.
+
+
+class BuildingSummary(object):
+
+    def __init__(self, building):
+        self.total_floor_area = 0
+        self.highest_floor = -1
+        # building_area_type of the first block, None for a building without blocks
+        self.first_building_area_type = None
+        self.all_area_types_same = True
+        self.total_wall_area = 0
+        self.total_fenestration_area = 0
+        self.block_count = 0
+
+        for thermal_block in building.ThermalBlocks:
+            if self.block_count == 0:
+                self.first_building_area_type = thermal_block.building_area_type
+            self.block_count += 1
+            self.total_floor_area += thermal_block.gross_conditioned_floor_area
+            if thermal_block.floor_number > self.highest_floor:
+                self.highest_floor = thermal_block.floor_number
+            if thermal_block.building_area_type != self.first_building_area_type:
+                self.all_area_types_same = False
+            for exterior_above_grade_wall in thermal_block.ExteriorAboveGradeWalls:
+                self.total_wall_area += exterior_above_grade_wall.area
+                self.total_fenestration_area += (exterior_above_grade_wall.area
+                                                 * exterior_above_grade_wall.vertical_fenestration_percentage / 100)
+
+    @property
+    def fenestration_fraction(self):
+        return self.total_fenestration_area / self.total_wall_area
@@ -0,0 +1,50 @@
+# Columns of element values for rules that repeat one comparison over many elements. Expressions only use
+# arithmetic and comparison operators, so with NumPy they run once over whole arrays and without it
+# they are applied one element at a time with the same result.
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def extract_columns(items, fields):
+    # a single pass over the items, a missing field is None
+    columns = {field: [] for field in fields}
+    read_items = getattr(items, "read_items", None)
+    for item in items if read_items is None else read_items():
+        for field in fields:
+            columns[field].append(item.get(field))
+    return columns
+
+
+def numbers(values):
+    if numpy is None:
+        return [math.nan if value is None else value for value in values]
+    return numpy.fromiter((math.nan if value is None else value for value in values), dtype=float, count=len(values))
+
+
+def evaluate(expression, *columns):
+    if numpy is None:
+        return [expression(*values) for values in zip(*columns)]
+    return expression(*columns)
+
+
+def choose(condition, if_true, if_false):
+    if numpy is None:
+        return [true_value if flag else false_value for flag, true_value, false_value in zip(condition, if_true, if_false)]
+    return numpy.where(condition, if_true, if_false)
+
+
+def to_list(column):
+    # plain Python values for records, NumPy float64 results become float
+    if numpy is None:
+        return list(column)
+    return numpy.asarray(column).tolist()
+
+
+def true_indices(mask):
+    if numpy is None:
+        return [index for index, flag in enumerate(mask) if flag]
+    return numpy.flatnonzero(mask).tolist()
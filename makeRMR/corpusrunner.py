@@ -0,0 +1,261 @@
+# Rule checks over a corpus of triplets, split into shards that run in separate processes or on separate
+# machines sharing a work directory. The manifest is a JSONL file with one triplet per line:
+#   {"triplet_root_name": "models/office-1", "rules": ["all"]}
+# and optionally an "origin" file the stages are made from with "overrides" by stage and pointer, as
+# in testcases. Each shard appends one line per finished triplet to its own file in the work directory,
+# which is also its checkpoint: a shard that is run again skips the triplets already there. The shard
+# files are merged into one report in the order of the manifest.
+import os
+import glob
+import json
+import time
+import socket
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from overlay import overlay_default
+from maskeddiff import set_pointer
+from rmrtriplet import RmrTriplet
+from resultcache import ResultCache, portable_result
+from schemavalidation import SchemaValidationError, SchemaValidators, load_schema
+from testcases import STAGES
+
+SCHEMA_FILE_NAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                                "standard229-ruleset-model-report.schema.json")
+
+
+def build_manifest(file_patterns, manifest_file_name, rules=("all",)):
+    # every *.user.json found whose proposed and baseline files are next to it
+    entries = []
+    for file_pattern in file_patterns:
+        if os.path.isdir(file_pattern):
+            file_pattern = os.path.join(file_pattern, "**", "*.user.json")
+        for file_name in sorted(glob.glob(file_pattern, recursive=True)):
+            if not file_name.endswith(".user.json"):
+                continue
+            triplet_root_name = file_name[:-len(".user.json")]
+            if os.path.exists(triplet_root_name + ".proposed.json") and os.path.exists(triplet_root_name + ".baseline.json"):
+                entries.append({"triplet_root_name": triplet_root_name, "rules": list(rules)})
+    with open(manifest_file_name, "w") as manifest_file:
+        for entry in entries:
+            manifest_file.write(json.dumps(entry) + "\n")
+    return len(entries)
+
+
+def read_manifest(manifest_file_name):
+    entries = []
+    with open(manifest_file_name, "r") as manifest_file:
+        for line_number, line in enumerate(manifest_file, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if "triplet_root_name" not in entry:
+                raise ValueError(f"line {line_number} of {manifest_file_name} has no triplet_root_name")
+            entries.append(entry)
+    triplet_root_names = [entry["triplet_root_name"] for entry in entries]
+    if len(set(triplet_root_names)) != len(triplet_root_names):
+        raise ValueError(f"{manifest_file_name} names a triplet more than once")
+    return entries
+
+
+def shard_of(triplet_root_name, shard_count):
+    # by a hash of the name, so a triplet stays in its shard when the manifest gains or loses others
+    return int(hashlib.sha1(triplet_root_name.encode("utf-8")).hexdigest(), 16) % shard_count
+
+
+def shard_file_name(work_dir, shard_index, shard_count):
+    return os.path.join(work_dir, f"shard-{shard_index:05d}-of-{shard_count:05d}.jsonl")
+
+
+def completed_triplets(results_file_name):
+    # names of the triplets in a shard file, a last line cut short by a crash is removed
+    completed = set()
+    if not os.path.exists(results_file_name):
+        return completed
+    good_length = 0
+    with open(results_file_name, "rb") as results_file:
+        for line in results_file:
+            try:
+                completed.add(json.loads(line)["triplet_root_name"])
+            except (ValueError, KeyError):
+                break
+            good_length += len(line)
+    if good_length != os.path.getsize(results_file_name):
+        with open(results_file_name, "r+b") as results_file:
+            results_file.truncate(good_length)
+    return completed
+
+
+def acquire_lock(lock_file_name):
+    # one runner per shard, a lock left by a process of this host that is gone is taken over
+    owner = f"{socket.gethostname()} {os.getpid()}"
+    while True:
+        try:
+            file_descriptor = os.open(lock_file_name, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                with open(lock_file_name, "r") as lock_file:
+                    host_name, process_id = lock_file.read().split()
+            except (OSError, ValueError):
+                raise ValueError(f"{lock_file_name} is held by another runner")
+            if host_name != socket.gethostname() or process_is_running(int(process_id)):
+                raise ValueError(f"{lock_file_name} is held by process {process_id} on {host_name}")
+            os.remove(lock_file_name)
+            continue
+        with os.fdopen(file_descriptor, "w") as lock_file:
+            lock_file.write(owner)
+        return
+
+
+def process_is_running(process_id):
+    try:
+        os.kill(process_id, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def check_entry(entry, validator, result_cache, quiet):
+    # the outcome of one manifest entry as a JSON ready dict
+    start = time.perf_counter()
+    outcome = {"triplet_root_name": entry["triplet_root_name"], "rules": entry.get("rules") or ["all"]}
+    try:
+        rmr_triplet = RmrTriplet(entry.get("origin"), entry["triplet_root_name"], validator=validator,
+                                 result_cache=result_cache)
+        overrides = entry.get("overrides") or {}
+        for stage in STAGES:
+            for pointer, value in overrides.get(stage, {}).items():
+                if not set_pointer(getattr(rmr_triplet, stage), pointer, value):
+                    raise ValueError(f"{pointer} matches nothing in the {stage} stage")
+        try:
+            results = rmr_triplet.check_rules(outcome["rules"], quiet=quiet)
+        except SchemaValidationError as err:
+            outcome["schema_errors"] = err.errors_by_file
+        else:
+            outcome["proposed_passed"] = not rmr_triplet.proposed_err
+            outcome["baseline_passed"] = not rmr_triplet.baseline_err
+            outcome["records"] = [record.to_dict() for result in results for record in portable_result(result).records]
+    except Exception as err:
+        # one triplet that cannot be checked does not stop the shard
+        outcome["error"] = f"{type(err).__name__}: {err}"
+    outcome["seconds"] = time.perf_counter() - start
+    return outcome
+
+
+def run_shard(manifest_file_name, work_dir, shard_index, shard_count, schema_file_name=SCHEMA_FILE_NAME,
+              result_cache_dir=None, quiet=True):
+    # checks the triplets of the shard that are not in its file yet, returns how many were checked now
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"shard {shard_index} is not one of the {shard_count} shards")
+    os.makedirs(work_dir, exist_ok=True)
+    results_file_name = shard_file_name(work_dir, shard_index, shard_count)
+    lock_file_name = results_file_name + ".lock"
+    acquire_lock(lock_file_name)
+    try:
+        completed = completed_triplets(results_file_name)
+        entries = [entry for entry in read_manifest(manifest_file_name)
+                   if shard_of(entry["triplet_root_name"], shard_count) == shard_index
+                   and entry["triplet_root_name"] not in completed]
+        if not entries:
+            return 0
+        validator = SchemaValidators(load_schema(schema_file_name)) if schema_file_name is not None else None
+        result_cache = ResultCache(result_cache_dir) if result_cache_dir is not None else None
+        with open(results_file_name, "a") as results_file:
+            for entry in entries:
+                outcome = check_entry(entry, validator, result_cache, quiet)
+                results_file.write(json.dumps(outcome, default=overlay_default) + "\n")
+                # the line is the checkpoint, it is on disk before the next triplet starts
+                results_file.flush()
+                os.fsync(results_file.fileno())
+        return len(entries)
+    finally:
+        os.remove(lock_file_name)
+
+
+def run_corpus(manifest_file_name, work_dir, shard_count, max_workers=None, schema_file_name=SCHEMA_FILE_NAME,
+               result_cache_dir=None, quiet=True):
+    # every shard on this machine, one process each; returns the triplets checked by each shard
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(run_shard, manifest_file_name, work_dir, shard_index, shard_count, schema_file_name,
+                               result_cache_dir, quiet)
+                   for shard_index in range(shard_count)]
+        return [future.result() for future in futures]
+
+
+def merge_shards(manifest_file_name, work_dir, shard_count, report_file_name):
+    # one report in manifest order, returns the totals and the triplets no shard has finished
+    outcomes = {}
+    for shard_index in range(shard_count):
+        results_file_name = shard_file_name(work_dir, shard_index, shard_count)
+        if not os.path.exists(results_file_name):
+            continue
+        with open(results_file_name, "r") as results_file:
+            for line in results_file:
+                try:
+                    outcome = json.loads(line)
+                except ValueError:
+                    break
+                outcomes[outcome["triplet_root_name"]] = outcome
+    totals = {"triplets": 0, "passed": 0, "failed": 0, "invalid": 0, "errors": 0, "missing": []}
+    with open(report_file_name, "w") as report_file:
+        for entry in read_manifest(manifest_file_name):
+            outcome = outcomes.get(entry["triplet_root_name"])
+            if outcome is None:
+                totals["missing"].append(entry["triplet_root_name"])
+                continue
+            report_file.write(json.dumps(outcome) + "\n")
+            totals["triplets"] += 1
+            if "error" in outcome:
+                totals["errors"] += 1
+            elif "schema_errors" in outcome:
+                totals["invalid"] += 1
+            elif outcome["proposed_passed"] and outcome["baseline_passed"]:
+                totals["passed"] += 1
+            else:
+                totals["failed"] += 1
+    return totals
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Check a corpus of RMR triplets in resumable shards.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    manifest_parser = subparsers.add_parser("manifest", help="write a manifest of the triplets found")
+    manifest_parser.add_argument("files", nargs="+", help="directories or glob patterns of *.user.json files")
+    manifest_parser.add_argument("--manifest", required=True)
+    manifest_parser.add_argument("--rules", nargs="+", default=["all"])
+    for command, command_help in [("run", "run shards, all of them unless --shard is given"),
+                                  ("merge", "merge the shard files into one report")]:
+        command_parser = subparsers.add_parser(command, help=command_help)
+        command_parser.add_argument("--manifest", required=True)
+        command_parser.add_argument("--work-dir", required=True)
+        command_parser.add_argument("--shards", type=int, required=True)
+    run_parser = subparsers.choices["run"]
+    run_parser.add_argument("--shard", type=int, help="run only this shard, as on one of several machines")
+    run_parser.add_argument("--workers", type=int)
+    run_parser.add_argument("--schema", default=SCHEMA_FILE_NAME)
+    run_parser.add_argument("--no-validate", action="store_true")
+    run_parser.add_argument("--result-cache", help="directory of a result cache shared by the shards")
+    run_parser.add_argument("--verbose", action="store_true", help="keep the passing records too")
+    subparsers.choices["merge"].add_argument("--report", required=True)
+    arguments = parser.parse_args()
+    if arguments.command == "manifest":
+        count = build_manifest(arguments.files, arguments.manifest, arguments.rules)
+        print(f"{count} triplets in {arguments.manifest}")
+    elif arguments.command == "run":
+        schema = None if arguments.no_validate else arguments.schema
+        if arguments.shard is not None:
+            checked = [run_shard(arguments.manifest, arguments.work_dir, arguments.shard, arguments.shards, schema,
+                                 arguments.result_cache, not arguments.verbose)]
+        else:
+            checked = run_corpus(arguments.manifest, arguments.work_dir, arguments.shards, arguments.workers, schema,
+                                 arguments.result_cache, not arguments.verbose)
+        print(f"{sum(checked)} triplets checked")
+    else:
+        totals = merge_shards(arguments.manifest, arguments.work_dir, arguments.shards, arguments.report)
+        print(f"{totals['triplets']} triplets in {arguments.report}: {totals['passed']} passed, {totals['failed']} failed, "
+              f"{totals['invalid']} invalid and {totals['errors']} could not be checked")
+        if totals["missing"]:
+            print(f"{len(totals['missing'])} triplets are not finished, run the shards again to resume")
@@ -0,0 +1,118 @@
+# Encoders and file writing for saving RMR instances. The "indent" writer gives the same bytes as
+# json.dump(..., indent=2), "compact" uses the C encoder without whitespace and "orjson" uses orjson when
+# it is installed, falling back to "compact" otherwise.
+import os
+import json
+import stat
+import hashlib
+import tempfile
+from collections.abc import Mapping
+
+from overlay import to_plain
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# read once, setting the umask to read it is not safe while other threads create files
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+def plain_default(value):
+    # default= for the encoders, unchanged parts of a typed triplet are typed records rather than dicts
+    if isinstance(value, Mapping):
+        return dict(value.items())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_indent(instance):
+    return json.dumps(to_plain(instance), indent=2, default=plain_default).encode("utf-8")
+
+
+def encode_compact(instance):
+    return json.dumps(to_plain(instance), separators=(",", ":"), default=plain_default).encode("utf-8")
+
+
+def encode_orjson(instance):
+    if orjson is None:
+        return encode_compact(instance)
+    return orjson.dumps(to_plain(instance), default=plain_default, option=orjson.OPT_INDENT_2)
+
+
+WRITERS = {"indent": encode_indent, "compact": encode_compact, "orjson": encode_orjson}
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(file_name):
+    data_hash = hashlib.sha256()
+    try:
+        with open(file_name, "rb") as existing_file:
+            for block in iter(lambda: existing_file.read(1024 * 1024), b""):
+                data_hash.update(block)
+    except FileNotFoundError:
+        return None
+    return data_hash.hexdigest()
+
+
+def replaced_file_mode(file_name):
+    # the mode of the file being replaced, for a new file the mode open() gives it
+    try:
+        return stat.S_IMODE(os.stat(file_name).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~UMASK
+
+
+def write_file(file_name, data, atomic=False):
+    if not atomic:
+        with open(file_name, "wb") as instance_file:
+            instance_file.write(data)
+        return
+    # written next to the target then renamed so a reader never sees a partial file; mkstemp makes
+    # files only the owner can read, the file gets the mode a plain write would have given it
+    file_descriptor, temporary_file_name = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(os.path.abspath(file_name)))
+    try:
+        with os.fdopen(file_descriptor, "wb") as instance_file:
+            instance_file.write(data)
+        os.chmod(temporary_file_name, replaced_file_mode(file_name))
+        os.replace(temporary_file_name, file_name)
+    except BaseException:
+        os.remove(temporary_file_name)
+        raise
+
+
+class InstanceWriter(object):
+    # remembers the hash and modification time of what it wrote so an unchanged instance is neither
+    # rewritten nor read back on the next save
+
+    def __init__(self, writer="indent", atomic=False, skip_unchanged=True):
+        if writer not in WRITERS:
+            raise ValueError(f"unknown writer {writer}, expected one of {list(WRITERS)}")
+        self.encode = WRITERS[writer]
+        self.atomic = atomic
+        self.skip_unchanged = skip_unchanged
+        self.written = {}
+
+    def is_unchanged(self, file_name, data_hash):
+        try:
+            modified_time = os.stat(file_name).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        remembered = self.written.get(file_name)
+        if remembered is not None and remembered[1] == modified_time:
+            return remembered[0] == data_hash
+        return file_hash(file_name) == data_hash
+
+    def save(self, file_name, instance):
+        # True when the file was written
+        data = self.encode(instance)
+        data_hash = content_hash(data)
+        if self.skip_unchanged and self.is_unchanged(file_name, data_hash):
+            return False
+        write_file(file_name, data, self.atomic)
+        self.written[file_name] = (data_hash, os.stat(file_name).st_mtime_ns)
+        return True
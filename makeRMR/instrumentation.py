@@ -0,0 +1,114 @@
+# Wall time, element counts and allocations of the phases of a run (load, validate, evaluate, compare
+# and save) and of each rule. Nothing is measured outside an instrument() block, where the hooks in
+# RmrTriplet and the rule registry record a Timing for each phase. Rules run in a process pool are
+# measured in the worker processes and are not seen here.
+import io
+import sys
+import time
+import pstats
+import cProfile
+import tracemalloc
+from collections import namedtuple
+from contextlib import contextmanager, nullcontext
+
+Timing = namedtuple("Timing", ["phase", "rule_id", "seconds", "elements", "allocated_blocks", "peak_bytes"])
+
+# the Instrumentation of the innermost instrument() block
+active_instrumentation = None
+
+
+class Instrumentation(object):
+
+    def __init__(self, callback=None, trace_allocations=False):
+        self.timings = []
+        self.callback = callback
+        self.trace_allocations = trace_allocations
+        self.profile_stats = None
+        self.snapshot = None
+
+    @contextmanager
+    def phase(self, name, rule_id=None, elements=0):
+        # allocated_blocks is the change in live memory blocks, the peak needs trace_allocations
+        if callable(elements):
+            elements = elements()
+        if self.trace_allocations:
+            tracemalloc.reset_peak()
+        allocated_blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak_bytes = tracemalloc.get_traced_memory()[1] if self.trace_allocations else None
+            timing = Timing(name, rule_id, seconds, elements, sys.getallocatedblocks() - allocated_blocks, peak_bytes)
+            self.timings.append(timing)
+            if self.callback is not None:
+                self.callback(timing)
+
+    def summary(self):
+        # totals by phase and rule, in the order they first ran
+        totals = {}
+        for timing in self.timings:
+            total = totals.setdefault((timing.phase, timing.rule_id), {"phase": timing.phase, "rule_id": timing.rule_id,
+                                                                       "calls": 0, "seconds": 0.0, "elements": 0,
+                                                                       "allocated_blocks": 0, "peak_bytes": None})
+            total["calls"] += 1
+            total["seconds"] += timing.seconds
+            total["elements"] += timing.elements
+            total["allocated_blocks"] += timing.allocated_blocks
+            if timing.peak_bytes is not None:
+                total["peak_bytes"] = max(total["peak_bytes"] or 0, timing.peak_bytes)
+        return list(totals.values())
+
+    def report(self):
+        lines = [f"{'phase':<10} {'rule':<8} {'calls':>6} {'seconds':>10} {'elements':>10} {'blocks':>10} {'peak MiB':>9}"]
+        for total in self.summary():
+            peak = "" if total["peak_bytes"] is None else f"{total['peak_bytes'] / 1048576:.1f}"
+            lines.append(f"{total['phase']:<10} {total['rule_id'] or '':<8} {total['calls']:>6} {total['seconds']:>10.4f} "
+                         f"{total['elements']:>10} {total['allocated_blocks']:>10} {peak:>9}")
+        if self.profile_stats is not None:
+            lines.extend(["", "cProfile, by cumulative time", self.profile_stats])
+        if self.snapshot is not None:
+            lines.extend(["", "tracemalloc, largest allocations still live at the end of the run"])
+            for statistic in self.snapshot.statistics("lineno")[:25]:
+                lines.append(str(statistic))
+        return "\n".join(lines) + "\n"
+
+
+def timed(name, rule_id=None, elements=0):
+    # elements can be a callable so it is only counted while instrumented
+    if active_instrumentation is None:
+        return nullcontext()
+    return active_instrumentation.phase(name, rule_id, elements)
+
+
+@contextmanager
+def instrument(report_file_name=None, profile=False, trace_allocations=False, callback=None):
+    # callback gets each Timing as it is recorded, the report file gets the summary and the
+    # cProfile and tracemalloc captures that were asked for
+    global active_instrumentation
+    instrumentation = Instrumentation(callback, trace_allocations)
+    previous_instrumentation = active_instrumentation
+    started_tracing = trace_allocations and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    profiler = cProfile.Profile() if profile else None
+    active_instrumentation = instrumentation
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield instrumentation
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            stats_text = io.StringIO()
+            pstats.Stats(profiler, stream=stats_text).sort_stats("cumulative").print_stats(40)
+            instrumentation.profile_stats = stats_text.getvalue()
+        active_instrumentation = previous_instrumentation
+        if trace_allocations:
+            instrumentation.snapshot = tracemalloc.take_snapshot()
+        if started_tracing:
+            tracemalloc.stop()
+        if report_file_name is not None:
+            with open(report_file_name, "w") as report_file:
+                report_file.write(instrumentation.report())
@@ -0,0 +1,257 @@
+# Memory mapped RMR files that are decoded one section or array item at a time. The first scan of a
+# file records the byte offsets of the top level values, of the Building values and of the items of
+# the arrays among them. They are kept in memory for the process, and with RMR_OFFSET_INDEX set also
+# saved in an index file next to the RMR so other processes reading the same file map it and load the
+# index instead of scanning it again. Values under those are decoded only when a rule reads them.
+import os
+import re
+import json
+import mmap
+from collections import OrderedDict
+from collections.abc import Sequence
+from munch import Munch
+
+from instancewriter import write_file
+from maskeddiff import join_pointer
+
+INDEX_SUFFIX = ".offsets"
+
+# index files are written when RMR_OFFSET_INDEX is set to anything but 0, fresh ones are always read
+WRITE_OFFSET_INDEX = os.environ.get("RMR_OFFSET_INDEX", "") not in ("", "0")
+
+# offsets of the files scanned or copied last by this process, by path, size and modification time
+SCANNED_INDEXES = OrderedDict()
+SCANNED_INDEXES_KEPT = 8
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+DECODER = json.JSONDecoder()
+CLOSING = {"{": "}", "[": "]"}
+
+
+def index_file_name_for(file_name):
+    return file_name + INDEX_SUFFIX
+
+
+def is_indexed(path, kind, parent_kind):
+    # the root and the values of its keys, and the arrays of objects under those, like Building.ThermalBlocks
+    return len(path) <= 1 or (len(path) == 2 and kind == "[" and parent_kind == "{")
+
+
+class ByteOffsets(object):
+    # byte offsets of increasing character offsets in the decoded text, the same numbers for ASCII files
+
+    def __init__(self, text):
+        self.text = text
+        self.ascii = text.isascii()
+        self.character = 0
+        self.byte = 0
+
+    def __call__(self, character):
+        if self.ascii:
+            return character
+        self.byte += len(self.text[self.character:character].encode("utf-8"))
+        self.character = character
+        return self.byte
+
+
+def scan_offsets(data):
+    # {pointer: {key: [start, end]} or [[start, end], ...]} for each indexed object or array, the values
+    # that are not indexed are skipped by the C decoder
+    text = str(data, "utf-8")
+    children = {}
+    position = WHITESPACE.match(text, 0).end()
+    if text[position:position + 1] != "{":
+        raise ValueError("an RMR file holds a JSON object")
+    scan_container(text, position, (), "", children, ByteOffsets(text))
+    return children
+
+
+def scan_container(text, position, path, pointer, children, byte_offsets):
+    # returns the position after the object or array that starts at position
+    kind = text[position]
+    spans = children[pointer] = {} if kind == "{" else []
+    position = WHITESPACE.match(text, position + 1).end()
+    if text[position:position + 1] == CLOSING[kind]:
+        return position + 1
+    while True:
+        if kind == "{":
+            if text[position:position + 1] != '"':
+                raise ValueError(f"expected a key at character {position}")
+            key, position = json.decoder.scanstring(text, position + 1)
+            position = WHITESPACE.match(text, position).end()
+            if text[position:position + 1] != ":":
+                raise ValueError(f"expected ':' at character {position}")
+            position = WHITESPACE.match(text, position + 1).end()
+        else:
+            key = len(spans)
+        start = byte_offsets(position)
+        child_kind = text[position:position + 1]
+        if child_kind in CLOSING and is_indexed(path + (key,), child_kind, kind):
+            position = scan_container(text, position, path + (key,), join_pointer(pointer, key), children, byte_offsets)
+        else:
+            position = DECODER.raw_decode(text, position)[1]
+        span = [start, byte_offsets(position)]
+        if kind == "{":
+            spans[key] = span
+        else:
+            spans.append(span)
+        position = WHITESPACE.match(text, position).end()
+        separator = text[position:position + 1]
+        if separator == ",":
+            position = WHITESPACE.match(text, position + 1).end()
+        elif separator == CLOSING[kind]:
+            return position + 1
+        else:
+            raise ValueError(f"expected ',' or '{CLOSING[kind]}' at character {position}")
+
+
+def file_signature(file_name):
+    status = os.stat(file_name)
+    return status.st_size, status.st_mtime_ns
+
+
+def index_key(file_name):
+    return (os.path.abspath(file_name),) + file_signature(file_name)
+
+
+def remember_index(file_name, children):
+    key = index_key(file_name)
+    SCANNED_INDEXES[key] = children
+    SCANNED_INDEXES.move_to_end(key)
+    while len(SCANNED_INDEXES) > SCANNED_INDEXES_KEPT:
+        SCANNED_INDEXES.popitem(last=False)
+
+
+def load_index(file_name, index_file_name=None):
+    # the offsets kept by this process or saved when they were taken from the file as it is now,
+    # otherwise the file is scanned and, with RMR_OFFSET_INDEX set, the index saved for the next reader
+    if index_file_name is None:
+        index_file_name = index_file_name_for(file_name)
+    children = SCANNED_INDEXES.get(index_key(file_name))
+    if children is not None:
+        return children
+    size, modified_time = file_signature(file_name)
+    try:
+        with open(index_file_name, "r") as index_file:
+            index = json.load(index_file)
+        if index["size"] == size and index["mtime_ns"] == modified_time:
+            remember_index(file_name, index["children"])
+            return index["children"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    with open(file_name, "rb") as instance_file:
+        if size == 0:
+            raise ValueError(f"{file_name} is empty")
+        with mmap.mmap(instance_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            children = scan_offsets(data)
+    remember_index(file_name, children)
+    if WRITE_OFFSET_INDEX:
+        save_index(file_name, children, index_file_name)
+    return children
+
+
+def save_index(file_name, children, index_file_name=None):
+    if index_file_name is None:
+        index_file_name = index_file_name_for(file_name)
+    size, modified_time = file_signature(file_name)
+    index = {"size": size, "mtime_ns": modified_time, "children": children}
+    try:
+        write_file(index_file_name, json.dumps(index, separators=(",", ":")).encode("utf-8"), atomic=True)
+    except OSError:
+        # a directory that cannot be written only means no saved index
+        pass
+
+
+def copy_index(source_file_name, file_name):
+    # for a byte for byte copy of an RMR, which has the same offsets as its source
+    children = load_index(source_file_name)
+    remember_index(file_name, children)
+    if WRITE_OFFSET_INDEX:
+        save_index(file_name, children)
+
+
+class MappedRmr(object):
+
+    def __init__(self, file_name, index_file_name=None):
+        self.file_name = file_name
+        self.index_file_name = index_file_name
+        self.children = load_index(file_name, index_file_name)
+        with open(file_name, "rb") as instance_file:
+            self.data = mmap.mmap(instance_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def decode(self, span):
+        return json.loads(self.data[span[0]:span[1]])
+
+    def node(self, pointer, span):
+        # indexed objects and arrays stay mapped, anything else is decoded
+        children = self.children.get(pointer)
+        if isinstance(children, dict):
+            return MappedObject(self, pointer)
+        if isinstance(children, list):
+            return MappedArray(self, pointer)
+        value = self.decode(span)
+        return Munch.fromDict(value) if isinstance(value, dict) else value
+
+    def close(self):
+        self.data.close()
+
+    def __reduce__(self):
+        # a process given a mapped RMR maps the file again and reads the saved index, or scans the file
+        # when there is none
+        return MappedRmr, (self.file_name, self.index_file_name)
+
+
+class MappedArray(Sequence):
+
+    def __init__(self, rmr, pointer):
+        self.rmr = rmr
+        self.pointer = pointer
+        self.spans = rmr.children[pointer]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        span = self.spans[index]
+        if index < 0:
+            index += len(self.spans)
+        return self.rmr.node(join_pointer(self.pointer, index), span)
+
+    def __len__(self):
+        return len(self.spans)
+
+
+class MappedObject(object):
+    # read only stand-in for the Munch tree of an RMR file, like StreamedObject but with random access
+
+    def __init__(self, rmr, pointer=""):
+        if not isinstance(rmr, MappedRmr):
+            rmr = MappedRmr(rmr)
+        self.rmr = rmr
+        self.pointer = pointer
+        self.spans = rmr.children[pointer]
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __getitem__(self, key):
+        return self.rmr.node(join_pointer(self.pointer, key), self.spans[key])
+
+    def get(self, key, default=None):
+        return self[key] if key in self.spans else default
+
+    def __contains__(self, key):
+        return key in self.spans
+
+    def __iter__(self):
+        return iter(self.spans)
+
+    def __len__(self):
+        return len(self.spans)
+
+    def keys(self):
+        return self.spans.keys()
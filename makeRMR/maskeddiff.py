@@ -0,0 +1,158 @@
+# Structural diff of RMR trees that skips JSON pointer style "allowed to differ" paths.
+# A "*" token in an allowed path matches any object key or array index.
+from itertools import zip_longest
+from collections.abc import Mapping, Sequence
+
+WILDCARD = "*"
+MISSING = object()
+
+
+def is_array(value):
+    return isinstance(value, Sequence) and not isinstance(value, (str, bytes))
+
+
+def split_pointer(pointer):
+    if pointer in ("", "/"):
+        return []
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer.lstrip("/").split("/")]
+
+
+def join_pointer(pointer, token):
+    return pointer + "/" + str(token).replace("~", "~0").replace("/", "~1")
+
+
+def resolve_pointer(document, pointer):
+    node = document
+    for token in split_pointer(pointer):
+        if is_array(node):
+            node = node[int(token)]
+        else:
+            node = node[token]
+    return node
+
+
+def child_keys(node, token):
+    # the keys or indexes of the existing values of node that a token matches
+    if token == WILDCARD:
+        if is_array(node):
+            return range(len(node))
+        return list(node) if isinstance(node, Mapping) else []
+    if is_array(node):
+        return [int(token)] if token.isdigit() and int(token) < len(node) else []
+    return [token] if isinstance(node, Mapping) and token in node else []
+
+
+def expand_pointer(document, pointer):
+    # the pointers of the existing values a pointer with "*" tokens matches, in document order
+    matches = [("", document)]
+    for token in split_pointer(pointer):
+        matches = [(join_pointer(node_pointer, key), node[key])
+                   for node_pointer, node in matches for key in child_keys(node, token)]
+    return [node_pointer for node_pointer, node in matches]
+
+
+def set_pointer(document, pointer, value):
+    # sets every value a pointer matches, with "*" tokens only the last key of an object need not exist yet
+    tokens = split_pointer(pointer)
+    if not tokens:
+        raise ValueError("cannot set the whole document through a pointer")
+    parent_pointer = "".join(join_pointer("", token) for token in tokens[:-1])
+    if tokens[-1] == WILDCARD:
+        pointers = expand_pointer(document, pointer)
+    else:
+        # an object takes a new key, an array only the index of an item it has
+        pointers = [join_pointer(parent, tokens[-1]) for parent in expand_pointer(document, parent_pointer)
+                    if isinstance(resolve_pointer(document, parent), Mapping)
+                    or child_keys(resolve_pointer(document, parent), tokens[-1])]
+    for value_pointer in pointers:
+        value_tokens = split_pointer(value_pointer)
+        parent = resolve_pointer(document, "".join(join_pointer("", token) for token in value_tokens[:-1]))
+        if is_array(parent):
+            parent[int(value_tokens[-1])] = value
+        else:
+            parent[value_tokens[-1]] = value
+    return pointers
+
+
+def compile_mask(allowed_paths):
+    # nested dictionaries of pointer tokens, None marks the end of an allowed path
+    mask = {}
+    for pointer in allowed_paths:
+        node = mask
+        for token in split_pointer(pointer):
+            node = node.setdefault(token, {})
+        node[None] = True
+    return mask
+
+
+def advance_masks(masks, token):
+    next_masks = []
+    for mask in masks:
+        child = mask.get(str(token))
+        if child is not None:
+            next_masks.append(child)
+        child = mask.get(WILDCARD)
+        if child is not None:
+            next_masks.append(child)
+    return next_masks
+
+
+def is_masked(masks):
+    for mask in masks:
+        if None in mask:
+            return True
+    return False
+
+
+def diff_paths(left, right, allowed_paths=(), pointer=""):
+    # left and right are the subtrees found at pointer, allowed_paths are absolute pointers
+    masks = [compile_mask(allowed_paths)]
+    for token in split_pointer(pointer):
+        masks = advance_masks(masks, token)
+    differences = []
+    _diff(left, right, masks, pointer, differences)
+    return differences
+
+
+def changed_keys(left, right):
+    # copy-on-write overlays of the same base can only differ where one of them was changed
+    base = getattr(left, "overlay_base", None)
+    if base is None or base is not getattr(right, "overlay_base", None):
+        return None
+    left_keys = left.touched_keys()
+    right_keys = right.touched_keys()
+    if left_keys is None or right_keys is None:
+        return None
+    return sorted(left_keys | right_keys)
+
+
+def _diff(left, right, masks, pointer, differences):
+    if left is right or is_masked(masks):
+        return
+    if isinstance(left, Mapping) and isinstance(right, Mapping):
+        keys = changed_keys(left, right)
+        if keys is None:
+            keys = list(left) + [key for key in right if key not in left]
+        for key in keys:
+            child_masks = advance_masks(masks, key)
+            if key in left and key in right:
+                _diff(left[key], right[key], child_masks, join_pointer(pointer, key), differences)
+            elif (key in left or key in right) and not is_masked(child_masks):
+                differences.append(join_pointer(pointer, key))
+    elif is_array(left) and is_array(right):
+        indices = changed_keys(left, right)
+        if indices is not None:
+            for index in indices:
+                _diff(left[index], right[index], advance_masks(masks, index), join_pointer(pointer, index),
+                      differences)
+            return
+        # iterated rather than indexed so streamed arrays are read once, side by side
+        for index, (left_item, right_item) in enumerate(zip_longest(left, right, fillvalue=MISSING)):
+            child_masks = advance_masks(masks, index)
+            if left_item is not MISSING and right_item is not MISSING:
+                _diff(left_item, right_item, child_masks, join_pointer(pointer, index), differences)
+            elif not is_masked(child_masks):
+                differences.append(join_pointer(pointer, index))
+    elif isinstance(left, Mapping) or isinstance(right, Mapping) or is_array(left) or is_array(right) \
+            or left != right:
+        differences.append(pointer)
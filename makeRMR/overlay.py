@@ -0,0 +1,308 @@
+# Copy-on-write views of a parsed RMR. Several overlays can share one base tree from json.load,
+# each overlay only stores the values that were set on it and wraps base objects and arrays
+# lazily the first time they are reached, so creating an overlay costs nothing.
+from collections.abc import Mapping, MutableMapping, MutableSequence, Sequence
+
+DELETED = object()
+
+# each of these takes the pointers changed since it last looked, rules to reuse results and
+# validation to validate only what changed
+CHANGE_CONSUMERS = ("rules", "validation")
+
+
+def wrap(value, parent, key):
+    if isinstance(value, Mapping) and not isinstance(value, OverlayNode):
+        return OverlayObject(value, parent, key)
+    if isinstance(value, list):
+        return OverlayArray(value, parent, key)
+    return value
+
+
+def plain_copy(value):
+    # a copy in plain dicts and lists, overlays in it are taken as their plain values
+    if isinstance(value, OverlayNode):
+        return to_plain(value)
+    if isinstance(value, Mapping):
+        return {key: plain_copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [plain_copy(item) for item in value]
+    return value
+
+
+def adopt(value, parent, key):
+    # an object or array set on an overlay is copied and becomes its child, so changes made below it
+    # are recorded too and changes to the value that was set are not seen
+    return wrap(plain_copy(value), parent, key)
+
+
+def overlay_default(value):
+    # default= for json.dump, the encoder calls it again for each nested overlay
+    if isinstance(value, OverlayObject):
+        return dict(value.items())
+    if isinstance(value, OverlayArray):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def to_plain(value):
+    # plain dicts and lists, sharing every base subtree that was never changed
+    if isinstance(value, OverlayNode):
+        if not value.modified:
+            return value.overlay_base
+        if isinstance(value, OverlayObject):
+            return {key: to_plain(item) for key, item in value.items()}
+        return [to_plain(item) for item in value]
+    return value
+
+
+class OverlayNode(object):
+    __slots__ = ("overlay_base", "modified", "_parent", "_key", "_children", "_changed_pointers", "_version")
+
+    def __init__(self, base, parent=None, key=None):
+        self.overlay_base = base
+        self.modified = False
+        self._parent = parent
+        self._key = key
+        self._children = {}
+        # only the root keeps the pointers changed anywhere below it, for each consumer, and a count of the changes
+        self._changed_pointers = {consumer: set() for consumer in CHANGE_CONSUMERS} if parent is None else None
+        self._version = 0 if parent is None else None
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except (KeyError, TypeError):
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name in OverlayNode.__slots__ or name in type(self).__slots__:
+            object.__setattr__(self, name, value)
+        else:
+            self[name] = value
+
+    def __delattr__(self, name):
+        try:
+            del self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def pointer(self):
+        tokens = []
+        node = self
+        while node._parent is not None:
+            tokens.append(str(node._key))
+            node = node._parent
+        return "".join("/" + token for token in reversed(tokens))
+
+    def mark_modified(self):
+        node = self
+        while node is not None and not node.modified:
+            node.modified = True
+            node = node._parent
+
+    def record_change(self, key=None):
+        # key is the changed key or index, None when the node as a whole changed like a resized array
+        tokens = [] if key is None else [str(key)]
+        node = self
+        while node._parent is not None:
+            tokens.append(str(node._key))
+            node = node._parent
+        changed_pointer = "".join("/" + token for token in reversed(tokens))
+        for changed_pointers in node._changed_pointers.values():
+            changed_pointers.add(changed_pointer)
+        node._version += 1
+        self.mark_modified()
+
+    def change_version(self):
+        # for a root overlay, a number that is different after any change below it
+        return self._version
+
+    def take_changes(self, consumer="rules"):
+        # pointers changed since the consumer's last call, for a root overlay
+        changed_pointers = self._changed_pointers[consumer]
+        self._changed_pointers[consumer] = set()
+        return changed_pointers
+
+    def touched_keys(self):
+        # keys that may differ from the base, None when everything has to be compared
+        raise NotImplementedError
+
+
+class OverlayObject(OverlayNode, MutableMapping):
+    __slots__ = ("_changes",)
+
+    def __init__(self, base=None, parent=None, key=None):
+        OverlayNode.__init__(self, {} if base is None else base, parent, key)
+        self._changes = {}
+
+    def __getitem__(self, key):
+        if key in self._changes:
+            value = self._changes[key]
+            if value is DELETED:
+                raise KeyError(key)
+            return value
+        child = self._children.get(key)
+        if child is not None:
+            return child
+        value = self.overlay_base[key]
+        child = wrap(value, self, key)
+        if child is not value:
+            self._children[key] = child
+        return child
+
+    def __setitem__(self, key, value):
+        self._changes[key] = adopt(value, self, key)
+        self._children.pop(key, None)
+        self.record_change(key)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._changes[key] = DELETED
+        self._children.pop(key, None)
+        self.record_change(key)
+
+    def __contains__(self, key):
+        if key in self._changes:
+            return self._changes[key] is not DELETED
+        return key in self.overlay_base
+
+    def __iter__(self):
+        for key in self.overlay_base:
+            if self._changes.get(key) is not DELETED:
+                yield key
+        for key, value in self._changes.items():
+            if key not in self.overlay_base and value is not DELETED:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __eq__(self, other):
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        return dict(self.items()) == dict(other.items())
+
+    def __repr__(self):
+        return f"OverlayObject({dict(self.items())!r})"
+
+    def touched_keys(self):
+        keys = set(self._changes)
+        for key, child in self._children.items():
+            if child.modified:
+                keys.add(key)
+        return keys
+
+
+class OverlayArray(OverlayNode, MutableSequence):
+    __slots__ = ("_changes", "_items")
+
+    def __init__(self, base, parent=None, key=None):
+        OverlayNode.__init__(self, base, parent, key)
+        self._changes = {}
+        # a private list of items once the array is resized, the items still share the base
+        self._items = None
+
+    def __len__(self):
+        return len(self.overlay_base) if self._items is None else len(self._items)
+
+    def index_of(self, index):
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("list index out of range")
+        return index
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        index = self.index_of(index)
+        if self._items is not None:
+            return self._items[index]
+        if index in self._changes:
+            return self._changes[index]
+        child = self._children.get(index)
+        if child is not None:
+            return child
+        value = self.overlay_base[index]
+        child = wrap(value, self, index)
+        if child is not value:
+            self._children[index] = child
+        return child
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            self.materialize()
+            self._items[index] = [adopt(item, self, None) for item in value]
+            self.renumber_items()
+            self.record_change()
+            return
+        index = self.index_of(index)
+        value = adopt(value, self, index)
+        if self._items is not None:
+            self._items[index] = value
+        else:
+            self._changes[index] = value
+            self._children.pop(index, None)
+        self.record_change(index)
+
+    def __delitem__(self, index):
+        self.materialize()
+        del self._items[index]
+        self.renumber_items()
+        self.record_change()
+
+    def insert(self, index, value):
+        self.materialize()
+        self._items.insert(index, adopt(value, self, None))
+        self.renumber_items()
+        self.record_change()
+
+    def materialize(self):
+        if self._items is None:
+            self._items = [self[index] for index in range(len(self.overlay_base))]
+            self._changes = {}
+            self._children = {}
+
+    def renumber_items(self):
+        # items that moved after a resize record their changes at their new index
+        for index, item in enumerate(self._items):
+            if isinstance(item, OverlayNode):
+                item._key = index
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def read_items(self):
+        # for read only passes over many items, unchanged base items are returned without wrapping them
+        if self._items is not None:
+            for item in self._items:
+                yield item
+            return
+        for index, value in enumerate(self.overlay_base):
+            if index in self._changes:
+                yield self._changes[index]
+            else:
+                child = self._children.get(index)
+                yield child if child is not None and child.modified else value
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence) or isinstance(other, (str, bytes)):
+            return NotImplemented
+        return len(self) == len(other) and all(mine == theirs for mine, theirs in zip(self, other))
+
+    def __repr__(self):
+        return f"OverlayArray({list(self)!r})"
+
+    def touched_keys(self):
+        if self._items is not None:
+            return None
+        keys = set(self._changes)
+        for index, child in self._children.items():
+            if child.modified:
+                keys.add(index)
+        return keys
@@ -0,0 +1,137 @@
+import os
+import json
+import pickle
+import hashlib
+
+from overlay import to_plain
+from tables import TABLES_VERSION
+from typedmodel import plain_value
+from results import RuleResult
+from instancewriter import write_file
+
+# pickled rule results are kept here, an empty RMR_RESULT_CACHE_DIR turns the cache off
+DEFAULT_RESULT_CACHE_DIR = os.environ.get("RMR_RESULT_CACHE_DIR",
+                                          os.path.join(os.path.dirname(os.path.abspath(__file__)), ".result_cache"))
+
+# the modules whose code decides what a rule reports, a change to any of them invalidates every entry
+RULE_MODULE_FILE_NAMES = ["rules.py", "ruleregistry.py", "results.py", "columnar.py", "tables.py", "systemindex.py",
+                          "buildingsummary.py", "maskeddiff.py"]
+
+rule_code_hash = None
+
+
+def rule_code_version():
+    global rule_code_hash
+    if rule_code_hash is None:
+        code_hash = hashlib.sha256()
+        for file_name in RULE_MODULE_FILE_NAMES:
+            with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), file_name), "rb") as module_file:
+                code_hash.update(module_file.read())
+        rule_code_hash = code_hash.hexdigest()
+    return rule_code_hash
+
+
+def result_key(rule_id, verbose, stage_hashes):
+    key_text = json.dumps([TABLES_VERSION, rule_code_version(), rule_id, verbose] + list(stage_hashes))
+    return hashlib.sha256(key_text.encode("utf-8")).hexdigest()
+
+
+def portable_result(result):
+    # records can hold overlay nodes of the triplet, they are stored as plain values
+    stored = RuleResult(result.rule_id, result.verbose)
+    stored.proposed_passed = result.proposed_passed
+    stored.baseline_passed = result.baseline_passed
+    stored.records = [record._replace(expected=plain_value(to_plain(record.expected)),
+                                      actual=plain_value(to_plain(record.actual)))
+                      for record in result.records]
+    return stored
+
+
+class ResultCache(object):
+    # rule results on disk by the content of the three stages, the rule and the table version,
+    # the least recently used entries are removed once the entries take more than max_bytes; other
+    # processes may share the directory and remove any entry at any time
+
+    def __init__(self, cache_dir=DEFAULT_RESULT_CACHE_DIR, max_bytes=64 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # size of the entries when the directory was last scanned plus what was written since, None
+        # before the first scan; the directory is scanned again only when it goes over max_bytes
+        self.total_bytes = None
+
+    def entry_file_name(self, key):
+        return os.path.join(self.cache_dir, key + ".pickle")
+
+    def get(self, rule_id, verbose, stage_hashes):
+        if not self.cache_dir:
+            return None
+        entry_file_name = self.entry_file_name(result_key(rule_id, verbose, stage_hashes))
+        try:
+            with open(entry_file_name, "rb") as entry_file:
+                result = pickle.load(entry_file)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # a damaged entry counts as a miss and is replaced by the next put
+            self.misses += 1
+            return None
+        # the modification time orders the entries for eviction
+        try:
+            os.utime(entry_file_name)
+        except FileNotFoundError:
+            # evicted by another process since it was read, the result read is still good
+            pass
+        self.hits += 1
+        return result
+
+    def put(self, rule_id, verbose, stage_hashes, result):
+        if not self.cache_dir:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        data = pickle.dumps(portable_result(result), protocol=pickle.HIGHEST_PROTOCOL)
+        write_file(self.entry_file_name(result_key(rule_id, verbose, stage_hashes)), data, atomic=True)
+        if self.total_bytes is not None:
+            # a replaced entry is counted twice, which only brings the next scan forward
+            self.total_bytes += len(data)
+        if self.total_bytes is None or self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        entries = []
+        total_bytes = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".pickle"):
+                try:
+                    status = entry.stat()
+                except FileNotFoundError:
+                    # removed by another process during the scan
+                    continue
+                entries.append((status.st_mtime_ns, status.st_size, entry.path))
+                total_bytes += status.st_size
+        entries.sort()
+        if total_bytes <= self.max_bytes:
+            self.total_bytes = total_bytes
+            return
+        # down to three quarters of max_bytes, so the puts after it do not scan again right away
+        for modified_time, size, path in entries:
+            if total_bytes <= self.max_bytes * 3 // 4:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+        self.total_bytes = total_bytes
+
+    def clear(self):
+        if self.cache_dir and os.path.isdir(self.cache_dir):
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith(".pickle"):
+                    try:
+                        os.remove(entry.path)
+                    except FileNotFoundError:
+                        pass
+        self.total_bytes = None
@@ -0,0 +1,119 @@
+import sys
+import json
+from collections import namedtuple
+
+from overlay import overlay_default
+
+PASS = "PASS"
+FAIL = "FAIL"
+NOT_CHECKED = "NOT_CHECKED"
+INFO = "INFO"
+
+
+class CheckRecord(namedtuple("CheckRecord", ["rule_id", "status", "stage", "path", "expected", "actual",
+                                             "message", "details"])):
+    # path is a tuple of keys and indexes and message is a str.format template, both are only
+    # turned into text when a sink asks for it
+    __slots__ = ()
+
+    @property
+    def pointer(self):
+        return "".join("/" + str(token) for token in self.path)
+
+    def render(self):
+        return self.message.format(expected=self.expected, actual=self.actual, pointer=self.pointer, **self.details)
+
+    def to_dict(self):
+        return {"rule_id": self.rule_id,
+                "status": self.status,
+                "stage": self.stage,
+                "path": self.pointer,
+                "expected": self.expected,
+                "actual": self.actual,
+                "message": self.render()}
+
+
+class FirstFailure(Exception):
+    # raised by a fail_fast RuleResult to stop its rule at the first failing element
+    pass
+
+
+class RuleResult(object):
+    # records of one rule, with verbose False only failures are kept so passing elements cost no formatting
+
+    def __init__(self, rule_id, verbose=True, fail_fast=False):
+        self.rule_id = rule_id
+        self.verbose = verbose
+        self.fail_fast = fail_fast
+        self.proposed_passed = True
+        self.baseline_passed = True
+        self.records = []
+
+    def info(self, path, message, **details):
+        if self.verbose:
+            self.records.append(CheckRecord(self.rule_id, INFO, None, path, None, None, message, details))
+
+    def not_checked(self, path, message, **details):
+        if self.verbose:
+            self.records.append(CheckRecord(self.rule_id, NOT_CHECKED, None, path, None, None, message, details))
+
+    def passed(self, path, message, expected=None, actual=None, **details):
+        if self.verbose:
+            self.records.append(CheckRecord(self.rule_id, PASS, None, path, expected, actual, message, details))
+
+    def failed(self, stage, path, message, expected=None, actual=None, **details):
+        self.records.append(CheckRecord(self.rule_id, FAIL, stage, path, expected, actual, message, details))
+        if stage == "PROPOSED":
+            self.proposed_passed = False
+        else:
+            self.baseline_passed = False
+        if self.fail_fast:
+            raise FirstFailure(self.rule_id)
+
+    @property
+    def failures(self):
+        return [record for record in self.records if record.status == FAIL]
+
+
+class TextSink(object):
+    # the report check_rules has always printed
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def write(self, rmr_triplet, rules_checked, results):
+        stream = sys.stdout if self.stream is None else self.stream
+        if not rules_checked:
+            return
+        print("------------------------", file=stream)
+        print("Checking rules for:", file=stream)
+        print(f"  {rmr_triplet.user_file_name}", file=stream)
+        print(f"  {rmr_triplet.proposed_file_name}", file=stream)
+        print(f"  {rmr_triplet.baseline_file_name}", file=stream)
+        print(f"  Specific rules checked: {rules_checked}", file=stream)
+        for result in results:
+            for record in result.records:
+                print(record.render(), file=stream)
+        # a stage that has not failed when a fail fast check stopped may still fail a rule that was not checked
+        for stage, failed in [("Proposed", rmr_triplet.proposed_err), ("Baseline", rmr_triplet.baseline_err)]:
+            if failed:
+                print(f"{stage} RMR file fails.", file=stream)
+            elif rmr_triplet.cut_short:
+                print(f"{stage} RMR file was not fully checked, the check stopped at the first failure.", file=stream)
+            else:
+                print(f"{stage} RMR file passes.", file=stream)
+        print("", file=stream)
+
+
+class JsonLinesSink(object):
+    # one JSON object per record for tools that read the results
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, rmr_triplet, rules_checked, results):
+        for result in results:
+            for record in result.records:
+                record_dict = record.to_dict()
+                record_dict["triplet"] = rmr_triplet.triplet_root_name
+                self.stream.write(json.dumps(record_dict, default=overlay_default) + "\n")
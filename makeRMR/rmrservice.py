@@ -0,0 +1,248 @@
+# Long running service that checks triplets on request, so the schema validators, the rules and
+# their tables are built once rather than for each run of main.py. Requests and responses are JSON
+# objects, one per line, over a local TCP or unix socket. A request gives each stage as an inline
+# instance or a file path (proposed and baseline default to the user stage), optional values to set
+# by pointer and the rules to check:
+#   {"id": 1, "user": "../combined-feasibility.user.json", "baseline": {...},
+#    "overrides": {"baseline": {"/ExteriorLightingAreas/0/power": 150}}, "rules": ["6a_1"]}
+# Requests are checked in a pool of workers and may finish out of order, every response line carries
+# the id of its request: a "record" line for each check record, then a "result" line, or an "error" line.
+import os
+import sys
+import json
+import asyncio
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from overlay import overlay_default
+from maskeddiff import set_pointer
+from rmrtriplet import RmrTriplet, load_origin
+from schemavalidation import SchemaValidationError, SchemaValidators, load_schema
+from testcases import STAGES
+
+SCHEMA_FILE_NAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                                "standard229-ruleset-model-report.schema.json")
+DEFAULT_PORT = 8229
+
+# set by init_service_worker in each worker of the pool
+service_validator = None
+
+
+def init_service_worker(schema_file_name, validator=None):
+    global service_validator
+    if validator is None and schema_file_name is not None:
+        validator = SchemaValidators(load_schema(schema_file_name))
+    service_validator = validator
+
+
+def worker_ready():
+    return os.getpid()
+
+
+def response_line(response):
+    return json.dumps(response, default=overlay_default) + "\n"
+
+
+class RequestSink(object):
+    # response lines of the records of one request
+
+    def __init__(self, request_id):
+        self.request_id = request_id
+        self.lines = []
+
+    def write(self, rmr_triplet, rules_checked, results):
+        for result in results:
+            for record in result.records:
+                response = {"type": "record", "id": self.request_id}
+                response.update(record.to_dict())
+                self.lines.append(response_line(response))
+
+
+def stage_instance(request, stage):
+    # an inline instance or the path of one, parsed files are kept by load_origin between requests
+    instance = request.get(stage, request.get("user") if stage != "user" else None)
+    if instance is None:
+        raise ValueError("a request needs at least the user stage")
+    if isinstance(instance, str):
+        return load_origin(instance)
+    if not isinstance(instance, dict):
+        raise ValueError(f"the {stage} stage must be an RMR object or the path of an RMR file")
+    return instance
+
+
+def check_request(request):
+    # runs in a worker, returns the response lines of the request
+    request_id = request.get("id")
+    try:
+        rules_to_check = request.get("rules") or ["all"]
+        overrides = request.get("overrides") or {}
+        unknown_stages = [stage for stage in overrides if stage not in STAGES]
+        if unknown_stages:
+            raise ValueError(f"unknown stages {unknown_stages} in overrides")
+        validator = service_validator if request.get("validate", True) else None
+        rmr_triplet = RmrTriplet(None, str(request_id), validator=validator,
+                                 instances=tuple(stage_instance(request, stage) for stage in STAGES))
+        for stage in STAGES:
+            for pointer, value in overrides.get(stage, {}).items():
+                if not set_pointer(getattr(rmr_triplet, stage), pointer, value):
+                    raise ValueError(f"{pointer} matches nothing in the {stage} stage")
+        sink = RequestSink(request_id)
+        try:
+            rmr_triplet.check_rules(rules_to_check, quiet=request.get("quiet", False), sink=sink)
+        except SchemaValidationError as err:
+            stage_by_file_name = {file_name: stage for stage, (file_name, instance)
+                                  in zip(STAGES, rmr_triplet.stage_files())}
+            return [response_line({"type": "result", "id": request_id, "valid": False,
+                                   "schema_errors": {stage_by_file_name[file_name]: errors
+                                                     for file_name, errors in err.errors_by_file.items()}})]
+        return sink.lines + [response_line({"type": "result", "id": request_id, "valid": True,
+                                            "proposed_passed": not rmr_triplet.proposed_err,
+                                            "baseline_passed": not rmr_triplet.baseline_err})]
+    except Exception as err:
+        # any failure of a request is answered, a client waits for a result or an error line
+        return [response_line({"type": "error", "id": request_id, "message": f"{type(err).__name__}: {err}"})]
+
+
+class RmrService(object):
+
+    def __init__(self, schema_file_name=SCHEMA_FILE_NAME, executor="process", max_workers=None):
+        # executor "process" checks requests in a pool of processes that each build the validators once,
+        # "thread" shares the validators of this process between threads
+        if executor == "process":
+            self.pool = ProcessPoolExecutor(max_workers=max_workers, initializer=init_service_worker,
+                                            initargs=(schema_file_name,))
+        elif executor == "thread":
+            init_service_worker(schema_file_name)
+            self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        else:
+            raise ValueError(f"unknown executor {executor}, expected 'process' or 'thread'")
+        self.max_workers = self.pool._max_workers
+        self.server = None
+
+    async def warm_up(self):
+        # start every worker now so the first requests do not wait for the validators to be built
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self.pool, worker_ready) for index in range(self.max_workers)])
+
+    async def check(self, request):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, check_request, request)
+
+    async def answer(self, request, writer, write_lock):
+        lines = await self.check(request)
+        async with write_lock:
+            writer.writelines(line.encode("utf-8") for line in lines)
+            await writer.drain()
+
+    async def handle_connection(self, reader, writer):
+        write_lock = asyncio.Lock()
+        pending = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("a request must be a JSON object")
+                except ValueError as err:
+                    async with write_lock:
+                        writer.write(response_line({"type": "error", "id": None, "message": str(err)}).encode("utf-8"))
+                        await writer.drain()
+                    continue
+                task = asyncio.create_task(self.answer(request, writer, write_lock))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending)
+        except ConnectionError:
+            for task in pending:
+                task.cancel()
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT, path=None):
+        await self.warm_up()
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle_connection, path, limit=2 ** 30)
+        else:
+            self.server = await asyncio.start_server(self.handle_connection, host, port, limit=2 ** 30)
+        return self.server
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT, path=None):
+        server = await self.start(host, port, path)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        self.pool.shutdown()
+
+
+async def check_triplets(requests, host="127.0.0.1", port=DEFAULT_PORT, path=None):
+    # client: sends the requests on one connection and yields each response as it arrives,
+    # until every request has its result or error
+    if path is not None:
+        reader, writer = await asyncio.open_unix_connection(path, limit=2 ** 30)
+    else:
+        reader, writer = await asyncio.open_connection(host, port, limit=2 ** 30)
+    try:
+        outstanding = 0
+        for request in requests:
+            writer.write(json.dumps(request).encode("utf-8") + b"\n")
+            outstanding += 1
+        await writer.drain()
+        while outstanding:
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("the service closed the connection before answering every request")
+            response = json.loads(line)
+            if response["type"] != "record":
+                outstanding -= 1
+            yield response
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def print_responses(requests, host, port, path):
+    async for response in check_triplets(requests, host, port, path):
+        print(json.dumps(response))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Check RMR triplets in a long running service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--path", help="unix socket to use instead of TCP")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="run the service")
+    serve_parser.add_argument("--schema", default=SCHEMA_FILE_NAME)
+    serve_parser.add_argument("--executor", choices=["process", "thread"], default="process")
+    serve_parser.add_argument("--workers", type=int)
+    check_parser = subparsers.add_parser("check", help="send a request and print the responses")
+    check_parser.add_argument("user", help="user RMR file")
+    check_parser.add_argument("--proposed", help="proposed RMR file, the user file by default")
+    check_parser.add_argument("--baseline", help="baseline RMR file, the user file by default")
+    check_parser.add_argument("--rules", nargs="+", default=["all"])
+    check_parser.add_argument("--quiet", action="store_true", help="only the failure records")
+    arguments = parser.parse_args()
+    if arguments.command == "serve":
+        service = RmrService(arguments.schema, arguments.executor, arguments.workers)
+        try:
+            asyncio.run(service.serve(arguments.host, arguments.port, arguments.path))
+        except KeyboardInterrupt:
+            sys.exit(0)
+    else:
+        request = {"id": 1, "rules": arguments.rules, "quiet": arguments.quiet}
+        # paths are opened by the service, so they are made absolute here
+        for stage in ("user", "proposed", "baseline"):
+            if getattr(arguments, stage) is not None:
+                request[stage] = os.path.abspath(getattr(arguments, stage))
+        asyncio.run(print_responses([request], arguments.host, arguments.port, arguments.path))
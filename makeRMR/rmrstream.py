@@ -0,0 +1,107 @@
+import json
+from collections.abc import Sequence
+from munch import Munch
+
+from maskeddiff import join_pointer
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# sections of an RMR that are read lazily, arrays are parsed one item at a time when iterated
+STREAMED_SECTIONS = {
+    (): {"Building": "object", "ExteriorLightingAreas": "array"},
+    ("Building",): {"ThermalBlocks": "array", "HeatingVentilationAirConditioningSystems": "array"},
+}
+
+
+def load_keys(file_name, keys):
+    # without ijson the whole file is loaded, which works but does not bound memory
+    with open(file_name, "r") as instance_file:
+        value = json.load(instance_file)
+    for key in keys:
+        value = value[key]
+    return value
+
+
+def stream_values(file_name, keys):
+    if ijson is None:
+        try:
+            yield load_keys(file_name, keys)
+        except KeyError:
+            pass
+        return
+    with open(file_name, "rb") as instance_file:
+        for value in ijson.items(instance_file, ".".join(keys), use_float=True):
+            yield value
+
+
+class StreamedArray(Sequence):
+
+    def __init__(self, file_name, keys):
+        self.file_name = file_name
+        self.keys = keys
+
+    def __iter__(self):
+        if ijson is None:
+            for item in load_keys(self.file_name, self.keys):
+                yield Munch.fromDict(item)
+            return
+        for item in stream_values(self.file_name, self.keys + ("item",)):
+            yield Munch.fromDict(item)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice) or index < 0:
+            return list(self)[index]
+        for position, item in enumerate(self):
+            if position == index:
+                return item
+        raise IndexError(f"{'.'.join(self.keys)} has no item {index} in {self.file_name}")
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class StreamedObject(object):
+    # read only stand-in for the Munch tree of an RMR file that only parses what is asked for
+
+    def __init__(self, file_name, keys=()):
+        self.file_name = file_name
+        self.keys = keys
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __getitem__(self, key):
+        section_type = STREAMED_SECTIONS.get(self.keys, {}).get(key)
+        if section_type == "array":
+            return StreamedArray(self.file_name, self.keys + (key,))
+        if section_type == "object":
+            return StreamedObject(self.file_name, self.keys + (key,))
+        for value in stream_values(self.file_name, self.keys + (key,)):
+            return Munch.fromDict(value)
+        raise KeyError(key)
+
+
+def iter_section(file_name, section):
+    # (pointer, item) pairs for ThermalBlocks, ExteriorAboveGradeWalls, ExteriorLightingAreas or
+    # HeatingVentilationAirConditioningSystems, holding at most one thermal block in memory
+    rmr = StreamedObject(file_name)
+    if section == "ExteriorLightingAreas":
+        pointer, items = "/ExteriorLightingAreas", rmr.ExteriorLightingAreas
+    elif section == "ExteriorAboveGradeWalls":
+        for block_index, thermal_block in enumerate(rmr.Building.ThermalBlocks):
+            walls_pointer = join_pointer(f"/Building/ThermalBlocks/{block_index}", "ExteriorAboveGradeWalls")
+            for wall_index, exterior_above_grade_wall in enumerate(thermal_block.get("ExteriorAboveGradeWalls", [])):
+                yield join_pointer(walls_pointer, wall_index), exterior_above_grade_wall
+        return
+    else:
+        pointer, items = "/Building/" + section, rmr.Building[section]
+    for index, item in enumerate(items):
+        yield join_pointer(pointer, index), item
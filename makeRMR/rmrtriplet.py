@@ -1,636 +1,331 @@
-import json
+import os
 from shutil import copyfile
-from munch import Munch
-from copy import deepcopy
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from rmrstream import StreamedObject
+from binarycache import load_instance
+from mappedrmr import MappedObject, copy_index
+from overlay import OverlayObject, to_plain
+from maskeddiff import resolve_pointer
+from instancewriter import InstanceWriter, content_hash, encode_compact, file_hash
+from typedmodel import plain_value, typed_model
+from ruleregistry import RULES, affected_rules, rule_cost, run_rule, run_rules
+from results import TextSink
+from schemavalidation import SchemaValidationError
+from instrumentation import timed
+from systemindex import SystemIndex
+from buildingsummary import BuildingSummary
+import rules  # registers the Standard 229 rules
+
+# parsed origin files by path, modification time, size and typed flag, overlays never change a parsed
+# tree so the triplets made from one origin share it and the file is parsed once
+PARSED_ORIGINS = OrderedDict()
+PARSED_ORIGINS_KEPT = 4
+
+
+def origin_key(file_name, typed=False):
+    status = os.stat(file_name)
+    return os.path.abspath(file_name), status.st_mtime_ns, status.st_size, typed
+
+
+def remember_origin(file_name, instance, typed=False):
+    # also used to hand a pool worker the origin its parent process already parsed
+    PARSED_ORIGINS[origin_key(file_name, typed)] = instance
+    while len(PARSED_ORIGINS) > PARSED_ORIGINS_KEPT:
+        PARSED_ORIGINS.popitem(last=False)
+
+
+def load_origin(file_name, typed=False):
+    key = origin_key(file_name, typed)
+    if key in PARSED_ORIGINS:
+        PARSED_ORIGINS.move_to_end(key)
+        return PARSED_ORIGINS[key]
+    instance = load_instance(file_name)
+    if typed:
+        instance = typed_model().load(instance)
+    remember_origin(file_name, instance, typed)
+    return instance
 
 
 class RmrTriplet(object):
 
-    def __init__(self, origin_file_name, triplet_root_name):
+    def __init__(self, origin_file_name, triplet_root_name, streaming=False, typed=False, validator=None,
+                 result_cache=None, instances=None, mapped=False):
         self.origin_file_name = origin_file_name
         self.triplet_root_name = triplet_root_name
         self.user_file_name = triplet_root_name + ".user.json"
         self.proposed_file_name = triplet_root_name + ".proposed.json"
         self.baseline_file_name = triplet_root_name + ".baseline.json"
         self.user_instance = {}
-        self.user = Munch()
+        self.user = OverlayObject()
         self.proposed_instance = {}
-        self.proposed = Munch()
+        self.proposed = OverlayObject()
         self.baseline_instance = {}
-        self.baseline = Munch()
-        self.create_triplet_instances()
+        self.baseline = OverlayObject()
+        # mapped triplets are streamed from memory mapped files that are decoded a section at a time
+        self.mapped = mapped
+        self.streaming = streaming or mapped
+        streaming = self.streaming
+        # with typed the parsed instances are records generated from the schema rather than dicts
+        self.typed = typed
+        # results of earlier checks by rule id and verbose flag, reused until a section the rule reads changes
+        self.rule_results = {}
+        self.instance_writer = InstanceWriter()
+        # with a SchemaValidators each stage is validated from memory before rules run
+        self.validator = validator
+        # (stage change version, schema errors) and the stage change version saved, by file name
+        self.validated = {}
+        self.saved_versions = {}
+        # with a ResultCache rule results are kept on disk by the content of the stages
+        self.result_cache = result_cache
+        # (stage change version, content hash) by file name
+        self.content_hashes = {}
+        # (stage change version, value) of what is derived from a stage, like its SystemIndex, by stage and name
+        self.stage_memos = {}
+        # parsed user, proposed and baseline instances to use instead of files, as the service does
+        self.instances = instances
+        if streaming and validator is not None:
+            raise ValueError("streamed triplets are not held in memory, validate their files with batchvalidate")
+        if streaming and instances is not None:
+            raise ValueError("streamed triplets are read from files, not from parsed instances")
+        with timed("load", elements=1 if origin_file_name is not None and instances is None else 3):
+            if streaming:
+                self.stream_triplet_instances()
+            else:
+                self.create_triplet_instances()
         self.proposed_err = False
         self.baseline_err = False
+        # set when the last check_rules stopped at a failure before checking everything
+        self.cut_short = False
+
+    def __getstate__(self):
+        # a triplet sent to a process only runs rules there; the validator's functions come from modules
+        # loaded from the validator cache that another process cannot import by name, so the validator
+        # and the result cache are left behind
+        state = dict(self.__dict__)
+        state["validator"] = None
+        state["result_cache"] = None
+        return state
 
     def create_triplet_instances(self):
-        copyfile(self.origin_file_name, self.user_file_name)
-        with open(self.user_file_name, "r") as instance_file:
-            self.user_instance = json.load(instance_file)
-            self.user = Munch.fromDict(self.user_instance)
-            self.user.transformation_stage = "USER"
-        copyfile(self.origin_file_name, self.proposed_file_name)
-        with open(self.proposed_file_name, "r") as instance_file:
-            self.proposed_instance = json.load(instance_file)
-            self.proposed = Munch.fromDict(self.proposed_instance)
-            self.proposed.transformation_stage = "PROPOSED"
-        copyfile(self.origin_file_name, self.baseline_file_name)
-        with open(self.baseline_file_name, "r") as instance_file:
-            self.baseline_instance = json.load(instance_file)
-            self.baseline = Munch.fromDict(self.baseline_instance)
-            self.baseline.transformation_stage = "BASELINE"
-
-    def save_instances(self):
-        with open(self.user_file_name, "w") as instance_file:
-            json.dump(self.user, instance_file, indent=2)
-        with open(self.proposed_file_name, "w") as instance_file:
-            json.dump(self.proposed, instance_file, indent=2)
-        with open(self.baseline_file_name, "w") as instance_file:
-            json.dump(self.baseline, instance_file, indent=2)
-
-    def check_rules(self, rules_to_check):
-        if "all" in rules_to_check:
-            rules_to_check = ["6a_1", "18a_1", "19v_4", "5c_1", "5h_1"]
-
-        if rules_to_check:
-            print("------------------------")
-            print("Checking rules for:")
-            print(f"  {self.user_file_name}")
-            print(f"  {self.proposed_file_name}")
-            print(f"  {self.baseline_file_name}")
-            print(f"  Specific rules checked: {rules_to_check}")
-
-            if "6a_1" in rules_to_check:
-                self.check_exterior_lights_6a_1()
-            if "18a_1" in rules_to_check:
-                self.check_system_selection_18a_1()
-            if "19v_4" in rules_to_check:
-                self.check_fan_power_19v_4()
-            if "5c_1" in rules_to_check:
-                self.vertical_fenestration_percentage_5c_1()
-            if "5h_1" in rules_to_check:
-                self.vertical_fenestration_assembly_5h_1()
-
-            if self.proposed_err:
-                print("Proposed RMR file fails.")
-            else:
-                print("Proposed RMR file passes.")
-            if self.baseline_err:
-                print("Baseline RMR file fails.")
-            else:
-                print("Baseline RMR file passes.")
-            print("")
-
-    def check_exterior_lights_6a_1(self):
-        # Last paragraph of baseline side of Table G3.1 part 6 and Table G3.6
-        table_g3_6 = {
-            "PARKING_LOTS_AND_DRIVES": ["tradable", 0.15, "W/sqft"],  # should be 0.15
-            "WALKWAYS_NARROW": ["tradable", 1.0, "W/ft"],
-            "WALKWAYS_WIDE": ["tradable", 0.2, "W/sqft"],
-            "PLAZA_AREAS": ["tradable", 0.2, "W/sqft"],
-            "SPECIAL_FEATURE_AREAS": ["tradable", 0.2, "W/sqft"],
-            "STAIRWAYS": ["tradable", 1.0, "W/sqft"],
-            "MAIN_ENTRIES": ["tradable", 30, "W/ft"],
-            "OTHER_DOORS": ["tradable", 20, "W/ft"],
-            "CANOPIES": ["tradable", 1.25, "W/sqft"],
-            "OPEN_OUTDOOR_SALES": ["tradable", 0.5, "W/sqft"],
-            "STREET_FRONTAGE_VEHICLE_SALES_LOTS": ["tradable", 20, "W/ft"],
-            "BUILDING_FACADES": ["nontradable", 0.0, ""],
-            "AUTOMATED_TELLER_MACHINE": ["nontradable", 0.0, ""],
-            "NIGHT_DEPOSITORIES": ["nontradable", 0.0, ""],
-            "GATEHOUSE_INSPECTION_STATIONS": ["nontradable", 0.0, ""],
-            "LOADING_AREAS_EMERGENCY_RESPONDERS": ["nontradable", 0.0, ""],
-            "DRIVE_UP_WINDOW_FAST_FOOD": ["nontradable", 0.0, ""],
-            "PARKING_NEAR_24_HR_RETAIL_ENTRANCES": ["nontradable", 0.0, ""]}
-
-        for exterior_lighting_areas in self.baseline.ExteriorLightingAreas:
-            print(f"Confirming rule 6a_1 for {exterior_lighting_areas.name}")
-            status, multiplier, units = table_g3_6[exterior_lighting_areas.category]
-            if status == "tradable":
-                if units == "W/sqft":
-                    expected_power = exterior_lighting_areas.area * multiplier
-                    if exterior_lighting_areas.power != expected_power:
-                        print(f"  No, invalid power found: {exterior_lighting_areas.power} but expected {expected_power}")
-                        self.baseline_err = True
-                    else:
-                        print(f"  Yes, power same as expected: {expected_power}")
-                else:
-                    print("  Rule not checked except for W/sqft tradable areas.")
-            else:
-                print("  Non-tradable area rules not yet checked.")
-
-        # remove changing portions to see if rest is the same
-        altered_user = deepcopy(self.user.ExteriorLightingAreas)
-        for exterior_lighting_areas in altered_user:
-            exterior_lighting_areas.power = 0
-        altered_baseline = deepcopy(self.baseline.ExteriorLightingAreas)
-        for exterior_lighting_areas in altered_baseline:
-            exterior_lighting_areas.power = 0
-        if altered_user == altered_baseline:
-            print("  Yes, the other portions of baseline ExteriorLightingAreas matches user")
-        else:
-            print("  No, the other portions of baseline ExteriorLightingAreas does not match user")
-            self.baseline_err = True
-
-        # user and proposed should match
-        if self.user.ExteriorLightingAreas == self.proposed.ExteriorLightingAreas:
-            print("  Yes, proposed ExteriorLightingAreas matches user")
+        # the origin file is parsed once and each stage is a copy-on-write overlay of it that only
+        # stores the fields set on that stage, without an origin file the given instances or the existing
+        # triplet files are read
+        if self.instances is not None:
+            self.user_instance, self.proposed_instance, self.baseline_instance = self.instances
+        elif self.origin_file_name is not None:
+            self.user_instance = load_origin(self.origin_file_name, self.typed)
+            self.proposed_instance = self.user_instance
+            self.baseline_instance = self.user_instance
         else:
-            print("  No, proposed ExteriorLightingAreas does not match user")
-            self.proposed_err = True
-
-    def check_system_selection_18a_1(self):
-        # G3.1.1a, table G3.1.1-3, table G3.1.1-4
-
-        table_g3_1_1_3 = {
-            "RESIDENTIAL": ["SYSTEM_1_PTAC", "SYSTEM_2_PTHP"],
-            "PUBLIC_ASSEMBLY_SMALL": ["SYSTEM_3_PSZ_AC", "SYSTEM_4_PSZ_HP"],
-            "PUBLIC_ASSEMBLY_LARGE": ["SYSTEM_12_SINGLE_ZONE_CONSTANT_HOT_WATER", "SYSTEM_13_SINGLE_ZONE_CONSTANT_ELECTRIC"],
-            "HEATED_ONLY_STORAGE": ["SYSTEM_9_HEATING_AND_VENTILATION_GAS", "SYSTEM_10_HEATING_AND_VENTILATION_ELECTRIC"],
-            "RETAIL_TWO_FLOOR_OR_LESS": ["SYSTEM_3_PSZ_AC", "SYSTEM_4_PSZ_HP"],
-            "OTHER_NONRESIDENTIAL_SMALL": ["SYSTEM_3_PSZ_AC", "SYSTEM_4_PSZ_HP"],
-            "OTHER_NONRESIDENTIAL_MEDIUM": ["SYSTEM_5_PACKAGED_VAV_WITH_REHEAT", "SYSTEM_6_PACKAGED_VAV_WITH_PFP_BOXES"],
-            "OTHER_NONRESIDENTIAL_LARGE": ["SYSTEM_7_VAV_WITH_REHEAT", "SYSTEM_8_VAV_WITH_PFP_BOXES"]
-        }
-
-        total_area = 0
-        highest_floor = -1
-        first_building_area_type = self.user.Building.ThermalBlocks[0].building_area_type
-        all_area_types_same = True
-        for thermal_block in self.user.Building.ThermalBlocks:
-            total_area += thermal_block.gross_conditioned_floor_area
-            if thermal_block.floor_number > highest_floor:
-                highest_floor = thermal_block.floor_number
-            if thermal_block.building_area_type != first_building_area_type:
-                all_area_types_same = False
-
-        if not all_area_types_same:
-            print("  Rules not checked that apply to buildings with multiple building types.")
-        else:
-            if first_building_area_type != "OFFICE":
-                print("  Rules not checked that apply to buildings other than office buildings.")
+            self.user_instance = load_instance(self.user_file_name)
+            self.proposed_instance = load_instance(self.proposed_file_name)
+            self.baseline_instance = load_instance(self.baseline_file_name)
+            if self.typed:
+                model = typed_model()
+                self.user_instance = model.load(self.user_instance)
+                self.proposed_instance = model.load(self.proposed_instance)
+                self.baseline_instance = model.load(self.baseline_instance)
+        self.user = OverlayObject(self.user_instance)
+        self.user.transformation_stage = "USER"
+        self.proposed = OverlayObject(self.proposed_instance)
+        self.proposed.transformation_stage = "PROPOSED"
+        self.baseline = OverlayObject(self.baseline_instance)
+        self.baseline.transformation_stage = "BASELINE"
+
+    def stream_triplet_instances(self):
+        # read only triplet for very large models, arrays are parsed one item at a time as rules iterate them
+        for file_name in [self.user_file_name, self.proposed_file_name, self.baseline_file_name]:
+            if self.origin_file_name is not None:
+                copyfile(self.origin_file_name, file_name)
+                if self.mapped:
+                    copy_index(self.origin_file_name, file_name)
+        stage_class = MappedObject if self.mapped else StreamedObject
+        self.user = stage_class(self.user_file_name)
+        self.proposed = stage_class(self.proposed_file_name)
+        self.baseline = stage_class(self.baseline_file_name)
+
+    def save_instances(self, instance_writer=None, concurrent=True):
+        # instance_writer picks the encoding, atomic writes and skipping of unchanged files, the triplet's
+        # own writer keeps the indented files; returns the names of the files that were written
+        if self.streaming:
+            raise ValueError(f"streamed triplet {self.triplet_root_name} is read only and cannot be saved")
+        if instance_writer is None:
+            instance_writer = self.instance_writer
+        file_names, instances = zip(*self.stage_files())
+        for file_name, instance in zip(file_names, instances):
+            self.saved_versions[file_name] = instance.change_version()
+        with timed("save", elements=len(file_names)):
+            if concurrent:
+                with ThreadPoolExecutor(max_workers=len(file_names)) as pool:
+                    written = list(pool.map(instance_writer.save, file_names, instances))
             else:
-                building_type_subcategory = "OTHER_NONRESIDENTIAL_MEDIUM"
-                if total_area < 25000 and highest_floor <= 3:
-                    building_type_subcategory = "OTHER_NONRESIDENTIAL_SMALL"
-                elif total_area > 150000 or highest_floor > 5:
-                    building_type_subcategory = "OTHER_NONRESIDENTIAL_LARGE"
-
-                expected_baseline_system, baseline_system_climate_zones_0_to_3a = table_g3_1_1_3[building_type_subcategory]
-                if self.user.climate_zone in ["0A", "0B", "1A", "1B", "2A", "2B", "3A", "3B", "3C"]:
-                    expected_baseline_system = baseline_system_climate_zones_0_to_3a
-
-                for hvac_system in self.baseline.Building.HeatingVentilationAirConditioningSystems:
-                    print(f"Confirming rule 18a_1 for {hvac_system.tag}")
-                    if hvac_system.hvac_system_type == expected_baseline_system:
-                        print(f"  Yes, baseline HVAC system: {hvac_system.hvac_system_type} matches expected for {hvac_system.tag}")
-                    else:
-                        print(f"  No, baseline HVAC system {hvac_system.hvac_system_type} does not match expected {expected_baseline_system} for {hvac_system.tag}")
-                        self.proposed_err = True
-
-        # remove changing portions to see if rest is the same
-        altered_user = deepcopy(self.user.Building.HeatingVentilationAirConditioningSystems)
-        for hvac_system in altered_user:
-            hvac_system.hvac_system_type = ""
-        altered_baseline = deepcopy(self.baseline.Building.HeatingVentilationAirConditioningSystems)
-        for hvac_system in altered_baseline:
-            hvac_system.hvac_system_type = ""
-        if altered_user == altered_baseline:
-            print("  Yes, the other portions of baseline HeatingVentilationAirConditioningSystems matches user")
-        else:
-            print("  No, the other portions of baseline HeatingVentilationAirConditioningSystems does not match user")
-            self.baseline_err = True
-
-        # user and proposed should match
-        if self.user.Building.HeatingVentilationAirConditioningSystems == self.proposed.Building.HeatingVentilationAirConditioningSystems:
-            print("  Yes, proposed HeatingVentilationAirConditioningSystems matches user")
+                written = [instance_writer.save(file_name, instance) for file_name, instance in zip(file_names, instances)]
+        return [file_name for file_name, was_written in zip(file_names, written) if was_written]
+
+    def stage_files(self):
+        return [(self.user_file_name, self.user), (self.proposed_file_name, self.proposed),
+                (self.baseline_file_name, self.baseline)]
+
+    def stage_hashes(self):
+        # content hash of each stage, computed again only after the stage changed
+        hashes = []
+        for file_name, stage in self.stage_files():
+            if self.streaming:
+                hashes.append(file_hash(file_name))
+                continue
+            version = stage.change_version()
+            if file_name not in self.content_hashes or self.content_hashes[file_name][0] != version:
+                self.content_hashes[file_name] = (version, content_hash(encode_compact(stage)))
+            hashes.append(self.content_hashes[file_name][1])
+        return hashes
+
+    def stage_memo(self, stage_name, name, build):
+        # build(stage) runs on first use and again only after the stage changed, streamed stages never change
+        stage = getattr(self, stage_name)
+        version = None if self.streaming else stage.change_version()
+        memo = self.stage_memos.get((stage_name, name))
+        if memo is None or memo[0] != version:
+            memo = self.stage_memos[stage_name, name] = (version, build(stage))
+        return memo[1]
+
+    def system_index(self, stage_name):
+        return self.stage_memo(stage_name, "system_index", lambda stage: SystemIndex(stage.Building))
+
+    def building_summary(self, stage_name):
+        return self.stage_memo(stage_name, "building_summary", lambda stage: BuildingSummary(stage.Building))
+
+    def plain_instance(self, stage):
+        instance = to_plain(stage)
+        return plain_value(instance) if self.typed else instance
+
+    def validate_instances(self):
+        # schema errors by file name, a stage is validated again only after it changed and then only the
+        # array items, like a thermal block or a fenestration assembly, holding the changes
+        for file_name, stage in self.stage_files():
+            version = stage.change_version()
+            if file_name not in self.validated or self.validated[file_name][0] != version:
+                changed_pointers = stage.take_changes("validation")
+                errors = None
+                if file_name in self.validated:
+                    with timed("validate", elements=len(changed_pointers)):
+                        try:
+                            errors = self.validator.revalidate(
+                                self.validated[file_name][1], changed_pointers,
+                                lambda pointer: self.plain_instance(resolve_pointer(stage, pointer)))
+                        except (KeyError, IndexError, TypeError, ValueError):
+                            # a change the items cannot be found for, like a Building that is no object
+                            errors = None
+                if errors is None:
+                    with timed("validate", elements=1):
+                        errors = self.validator.errors(self.plain_instance(stage))
+                self.validated[file_name] = (version, errors)
+        return {file_name: errors for file_name, (version, errors) in self.validated.items()}
+
+    def validated_files(self):
+        # schema errors of the saved files whose content was validated, so they need not be read again
+        return {file_name: errors for file_name, (version, errors) in self.validated.items()
+                if self.saved_versions.get(file_name) == version}
+
+    def changed_pointers(self):
+        # pointers set on any stage since the last check, None when the stages do not track changes
+        if self.streaming:
+            return None
+        changed_pointers = set()
+        for stage in [self.user, self.proposed, self.baseline]:
+            changed_pointers |= stage.take_changes()
+        return changed_pointers
+
+    def forget_changed_results(self):
+        changed_pointers = self.changed_pointers()
+        if changed_pointers is None:
+            self.rule_results = {}
+            return
+        cached_rule_ids = {rule_id for rule_id, verbose in self.rule_results}
+        for rule_id in affected_rules(cached_rule_ids, changed_pointers):
+            self.rule_results.pop((rule_id, True), None)
+            self.rule_results.pop((rule_id, False), None)
+
+    def check_rules(self, rules_to_check, executor=None, max_workers=None, quiet=False, sink=None, incremental=True,
+                    fail_fast=False):
+        # executor None runs the rules one after the other, "thread" or "process" runs them in a pool,
+        # quiet keeps only the failure records and prints nothing unless a sink is given,
+        # incremental reuses the results of rules that read nothing changed through the stages since they ran
+        # and the results in the result cache for the same stage contents,
+        # fail_fast runs the cheapest rules first and stops at the first failure, returning the results of
+        # the rules checked up to it
+        if "all" in rules_to_check:
+            rules_to_check = list(RULES)
+        unknown_rules = [rule_id for rule_id in rules_to_check if rule_id not in RULES]
+        if unknown_rules:
+            raise ValueError(f"unknown rules {unknown_rules}, registered rules are {list(RULES)}")
+        if fail_fast and executor is not None:
+            raise ValueError("fail_fast checks rules one at a time, it cannot be used with an executor")
+        if sink is None and not quiet:
+            sink = TextSink()
+
+        if self.validator is not None:
+            errors_by_file = {file_name: errors for file_name, errors in self.validate_instances().items() if errors}
+            if errors_by_file:
+                raise SchemaValidationError(errors_by_file)
+
+        verbose = not quiet
+        self.forget_changed_results()
+        if not incremental:
+            self.rule_results = {}
+        results_by_id = {rule_id: self.rule_results[rule_id, verbose] for rule_id in rules_to_check
+                         if (rule_id, verbose) in self.rule_results}
+        rule_ids_to_run = [rule_id for rule_id in rules_to_check if rule_id not in results_by_id]
+        stage_hashes = None
+        if self.result_cache is not None and rule_ids_to_run:
+            stage_hashes = self.stage_hashes()
+            if incremental:
+                for rule_id in rule_ids_to_run:
+                    result = self.result_cache.get(rule_id, verbose, stage_hashes)
+                    if result is not None:
+                        results_by_id[rule_id] = result
+                        self.rule_results[rule_id, verbose] = result
+                rule_ids_to_run = [rule_id for rule_id in rule_ids_to_run if rule_id not in results_by_id]
+        if fail_fast:
+            rules_checked = self.run_fail_fast(rules_to_check, results_by_id, rule_ids_to_run, verbose, stage_hashes)
         else:
-            print("  No, proposed HeatingVentilationAirConditioningSystems does not match user")
-            self.proposed_err = True
-
-    def check_fan_power_19v_4(self):
-        # G3.1.2.9 System Fan Power, Table G3.1.2.9, Table G3.9.1
-        # Users Manual for 90.1-2016 - Example G-M
-
-        section_g3_1_2_9_mapping = {
-            "SYSTEM_1_PTAC": "CFMs",
-            "SYSTEM_2_PTHP": "CFMs",
-            "SYSTEM_3_PSZ_AC": "bhp/fan motor efficiency",
-            "SYSTEM_4_PSZ_HP": "bhp/fan motor efficiency",
-            "SYSTEM_5_PACKAGED_VAV_WITH_REHEAT": "bhp/fan motor efficiency",
-            "SYSTEM_6_PACKAGED_VAV_WITH_PFP_BOXES": "bhp/fan motor efficiency",
-            "SYSTEM_7_VAV_WITH_REHEAT": "bhp/fan motor efficiency",
-            "SYSTEM_8_VAV_WITH_PFP_BOXES": "bhp/fan motor efficiency",
-            "SYSTEM_9_HEATING_AND_VENTILATION_GAS": "CFMsPlusNonMechanicalCooling",
-            "SYSTEM_10_HEATING_AND_VENTILATION_ELECTRIC": "CFMsPlusNonMechanicalCooling",
-            "SYSTEM_11_SINGLE_ZONE_VAV": "bhp/fan motor efficiency",
-            "SYSTEM_12_SINGLE_ZONE_CONSTANT_HOT_WATER": "bhp/fan motor efficiency",
-            "SYSTEM_13_SINGLE_ZONE_CONSTANT_ELECTRIC": "bhp/fan motor efficiency"
-        }
-
-        table_g3_1_2_9_mapping = {
-            "SYSTEM_3_PSZ_AC": 0.00094,
-            "SYSTEM_4_PSZ_HP": 0.00094,
-            "SYSTEM_5_PACKAGED_VAV_WITH_REHEAT": 0.0013,
-            "SYSTEM_6_PACKAGED_VAV_WITH_PFP_BOXES": 0.0013,
-            "SYSTEM_7_VAV_WITH_REHEAT": 0.0013,
-            "SYSTEM_8_VAV_WITH_PFP_BOXES": 0.0013,
-            "SYSTEM_11_SINGLE_ZONE_VAV": 0.00062,
-            "SYSTEM_12_SINGLE_ZONE_CONSTANT_HOT_WATER": 0.00094,
-            "SYSTEM_13_SINGLE_ZONE_CONSTANT_ELECTRIC": 0.00094
-        }
-
-        table_g3_9_1_mapping = {
-            1.0: 82.5,
-            1.5: 84.0,
-            2.0: 84.0,
-            3.0: 87.5,
-            5.0: 87.5,
-            7.5: 89.5,
-            10.0: 89.5,
-            15.0: 91.0,
-            20.0: 91.0,
-            25.0: 91.0,
-            30.0: 92.4,
-            40.0: 93.0,
-            50.0: 93.0,
-            60.0: 93.6,
-            75.0: 94.1,
-            100.0: 94.5,
-            125.0: 94.5,
-            150.0: 95.0,
-            200.0: 95.0
-        }
-
-        for hvac_system in self.baseline.Building.HeatingVentilationAirConditioningSystems:
-            print(f"Confirming rule 19v_4 for {hvac_system.tag}")
-            fan_power_calculation_method = section_g3_1_2_9_mapping[hvac_system.hvac_system_type]
-
-            expected_electric_power_to_fan_motor = 0
-            if fan_power_calculation_method == "CFMsPlusNonMechanicalCooling":
-                print("  Rules not checked for fan power related to non-mechanical cooling.")
-                fan_power_calculation_method = "CFMs"
-
-            if fan_power_calculation_method == "CFMs":
-                expected_electric_power_to_fan_motor = 0.3 * hvac_system.design_supply_fan_airflow_rate
-            elif fan_power_calculation_method == "bhp/fan motor efficiency":
-                supply_volume_multiplier = table_g3_1_2_9_mapping[hvac_system.hvac_system_type]
-                expected_brake_horse_power = supply_volume_multiplier * hvac_system.design_supply_fan_airflow_rate
-
-                if self.nearly_equal(hvac_system.fan_brake_horsepower, expected_brake_horse_power, 0.5):
-                    print(f"  Yes, fan break horsepower {hvac_system.fan_brake_horsepower} nearly same as expected: {expected_brake_horse_power}")
-                else:
-                    print(f"  No, invalid fan break horsepower: {hvac_system.fan_brake_horsepower} but expected {expected_brake_horse_power}")
-                    self.baseline_err = True
-
-                shaft_input_power_limits = table_g3_9_1_mapping.keys()
-                shaft_input_power_selected = 0
-                for limit in shaft_input_power_limits:
-                    # print(limit)
-                    if expected_brake_horse_power <= limit:
-                        shaft_input_power_selected = limit
-                if shaft_input_power_selected != 0:
-                    motor_efficiency = table_g3_9_1_mapping[shaft_input_power_selected]
-                    print(f"  Motor efficiency of {motor_efficiency} selected based {shaft_input_power_selected} which is next larger from {expected_brake_horse_power}")
-                else:
-                    print(f"  Look up of motor efficiency did not work for {hvac_system.tag} with a size of {expected_brake_horse_power} so selecting 95%")
-                    motor_efficiency = 95
-                expected_electric_power_to_fan_motor = expected_brake_horse_power * 0.746 / (motor_efficiency / 100)
-                print(f"  Rules not checked related to A adjustment from Section 6.5.3.1.1 for {hvac_system.tag}")
-            else:
-                print("  No, unknown fan power calculation method")
+            rules_checked = rules_to_check
+            if rule_ids_to_run:
+                results_by_id.update(zip(rule_ids_to_run, run_rules([RULES[rule_id] for rule_id in rule_ids_to_run],
+                                                                    self, executor, max_workers, verbose)))
+            for rule_id in rule_ids_to_run:
+                self.store_result(rule_id, verbose, stage_hashes, results_by_id[rule_id])
+        results = [results_by_id[rule_id] for rule_id in rules_checked]
+        self.cut_short = fail_fast and not all(result.proposed_passed and result.baseline_passed for result in results)
+        for result in results:
+            if not result.proposed_passed:
                 self.proposed_err = True
-
-            if self.nearly_equal(hvac_system.electric_power_to_fan_motor, expected_electric_power_to_fan_motor, 0.5):
-                print(f"  Yes, power {hvac_system.electric_power_to_fan_motor} nearly same as expected: {expected_electric_power_to_fan_motor}")
-            else:
-                print(f"  No, invalid power found: {hvac_system.electric_power_to_fan_motor} but expected {expected_electric_power_to_fan_motor}")
+            if not result.baseline_passed:
                 self.baseline_err = True
-
-        # remove changing portions to see if rest is the same
-        altered_user = deepcopy(self.user.Building.HeatingVentilationAirConditioningSystems)
-        for hvac_system in altered_user:
-            hvac_system.electric_power_to_fan_motor = 0
-            hvac_system.fan_brake_horsepower = 0
-        altered_baseline = deepcopy(self.baseline.Building.HeatingVentilationAirConditioningSystems)
-        for hvac_system in altered_baseline:
-            hvac_system.electric_power_to_fan_motor = 0
-            hvac_system.fan_brake_horsepower = 0
-        if altered_user == altered_baseline:
-            print("  Yes, the other portions of baseline HeatingVentilationAirConditioningSystems matches user")
-        else:
-            print("  No, the other portions of baseline HeatingVentilationAirConditioningSystems does not match user")
-            self.baseline_err = True
-
-        # user and proposed should match
-        if self.user.Building.HeatingVentilationAirConditioningSystems == self.proposed.Building.HeatingVentilationAirConditioningSystems:
-            print("  Yes, proposed HeatingVentilationAirConditioningSystems matches user")
-        else:
-            print("  No, proposed HeatingVentilationAirConditioningSystems does not match user")
-            self.proposed_err = True
-
-    def vertical_fenestration_percentage_5c_1(self):
-        # Table G3.1 Part 5 - Baseline paragraph (c)
-        # Table G3.1.1-1
-        table_g3_1_1_1 = {
-            "GROCERY_STORE": 0.07,
-            "HEALTHCARE_OUTPATIENT": 0.21,
-            "HOSPITAL": 0.27,
-            "HOTEL_LARGE": 0.24,
-            "HOTEL_SMALL": 0.34,
-            "OFFICE_SMALL": 0.19,
-            "OFFICE_MEDIUM": 0.31,
-            "OFFICE_LARGE": 0.40,
-            "RESTAURANT_QUICK_SERVICE": 0.34,
-            "RESTAURANT_FULL_SERVICE0": 0.24,
-            "RETAIL_STAND_ALONE": 0.11,
-            "RETAIL_STRIP_MALL": 0.20,
-            "SCHOOL_PRIMARY": 0.22,
-            "SCHOOL_SECONDARY_AND_UNIVERSITY": 0.22,
-            "WAREHOUSE_NON_REFRIGERATED": 0.06
-        }
-        user_total_floor_area = 0
-        user_total_wall_area = 0
-        user_total_fenestration_area = 0
-        first_building_area_type = self.user.Building.ThermalBlocks[0].building_area_type
-        all_area_types_same = True
-        for thermal_block in self.user.Building.ThermalBlocks:
-            user_total_floor_area += thermal_block.gross_conditioned_floor_area
-            if thermal_block.building_area_type != first_building_area_type:
-                all_area_types_same = False
-            for exterior_above_grade_wall in thermal_block.ExteriorAboveGradeWalls:
-                user_total_wall_area += exterior_above_grade_wall.area
-                user_total_fenestration_area += exterior_above_grade_wall.area * exterior_above_grade_wall.vertical_fenestration_percentage / 100
-
-        user_overall_fenestration_fraction = user_total_fenestration_area / user_total_wall_area
-
-        print(f"  User total floor area:              {user_total_floor_area}")
-        print(f"  User total wall area:               {user_total_wall_area}")
-        print(f"  User total fenestration area:       {user_total_fenestration_area}")
-        print(f"  User overall fenestration fraction: {user_overall_fenestration_fraction}")
-
-        if not all_area_types_same:
-            print("  Rules not checked that apply to buildings with multiple building types.")
-        else:
-            if first_building_area_type == "OFFICE":
-                if user_total_floor_area <= 5000:
-                    first_building_area_type = "OFFICE_SMALL"
-                elif user_total_floor_area > 50000:
-                    first_building_area_type = "OFFICE_LARGE"
-                else:
-                    first_building_area_type = "OFFICE_MEDIUM"
-
-            if first_building_area_type in table_g3_1_1_1.keys():
-                expected_fenestration_fraction = table_g3_1_1_1[first_building_area_type]
-                print(f"  The expected fenestration fraction is {expected_fenestration_fraction} for building type {first_building_area_type}")
-                expected_total_fenestration_area = expected_fenestration_fraction * user_total_wall_area
-                baseline_total_fenestration_area = 0
-                for thermal_block in self.baseline.Building.ThermalBlocks:
-                    for exterior_above_grade_wall in thermal_block.ExteriorAboveGradeWalls:
-                        baseline_total_fenestration_area += exterior_above_grade_wall.area * exterior_above_grade_wall.vertical_fenestration_percentage / 100
-                if self.nearly_equal(expected_total_fenestration_area, baseline_total_fenestration_area, 1):
-                    print(f"  Yes, baseline fenestration area {baseline_total_fenestration_area} as expected.")
-                else:
-                    print(f"  No, baseline fenestration area {baseline_total_fenestration_area} does not match expected fenestration area {expected_total_fenestration_area}")
-                    self.proposed_err = True
-            else:
-                print(f"  Rules not checked that apply to buildings with building type: {first_building_area_type}")
-
-        # remove changing portions to see if rest is the same
-        altered_user = deepcopy(self.user.Building.ThermalBlocks)
-        for thermal_block in altered_user:
-            for exterior_above_grade_wall in thermal_block.ExteriorAboveGradeWalls:
-                exterior_above_grade_wall.vertical_fenestration_percentage = 0
-        altered_baseline = deepcopy(self.baseline.Building.ThermalBlocks)
-        for thermal_block in altered_baseline:
-            for exterior_above_grade_wall in thermal_block.ExteriorAboveGradeWalls:
-                exterior_above_grade_wall.vertical_fenestration_percentage = 0
-        if altered_user == altered_baseline:
-            print("  Yes, the other portions of baseline ThermalBlocks matches user")
-        else:
-            print("  No, the other portions of baseline ThermalBlocks does not match user")
-            self.baseline_err = True
-
-        # user and proposed should match
-        if self.user.Building.ThermalBlocks == self.proposed.Building.ThermalBlocks:
-            print("  Yes, proposed ThermalBlocks matches user")
-        else:
-            print("  No, proposed ThermalBlocks does not match user")
-            self.proposed_err = True
-
-    def vertical_fenestration_assembly_5h_1(self):
-        # Table G3.1 Part 5 - Baseline paragraph (d) Vertical Fenestration Assemblies
-        # Table G3.4-4 Envelope for Climate Zones 4 (A,B,C)
-        table_g_4_climate_zone_lookup = {
-            "0A": "0A_0B_1A_1B",
-            "0B": "0A_0B_1A_1B",
-            "1A": "0A_0B_1A_1B",
-            "1B": "0A_0B_1A_1B",
-            "2A": "2A_2B",
-            "2B": "2A_2B",
-            "3A": "3A_3B",
-            "3B": "3A_3B",
-            "3C": "3C",
-            "4A": "4A_4B_4C",
-            "4B": "4A_4B_4C",
-            "4C": "4A_4B_4C",
-            "5A": "5A_5B_5C",
-            "5B": "5A_5B_5C",
-            "5C": "5A_5B_5C",
-            "6A": "6A_6B",
-            "6B": "6A_6B",
-            "7": "7",
-            "8": "8"
-        }
-
-        table_g3_4_fenestration_assembly = {
-            "0A_0B_1A_1B":
-                {
-                    "NONRESIDENTIAL": [
-                        [0.0, 40.0, 1.22, 0.25, 0.28]   # fenestration percentage low, fenestration percentage low, U, SHGC, VT
-                    ],
-                    "RESIDENTIAL": [
-                        [0.0, 40.0, 1.22, 0.25, 0.28]
-                    ],
-                    "SEMIHEATED": [
-                        [0.0, 40.0, 1.22, 0.40, 0.44]
-                    ]
-                },
-            "2A_2B":
-                {
-                    "NONRESIDENTIAL": [
-                        [0.0, 40.0, 1.22, 0.25, 0.28]
-                    ],
-                    "RESIDENTIAL": [
-                        [0.0, 10.0, 1.22, 0.39, 0.43],
-                        [10.1, 40.0, 1.22, 0.25, 0.28]
-                    ],
-                    "SEMIHEATED": [
-                        [0.0, 40.0, 1.22, 0.40, 0.44]
-                    ],
-                },
-            "3A_3B":
-                {
-                    "NONRESIDENTIAL": [
-                        [0.0, 10.0, 0.57, 0.39, 0.43],
-                        [10.1, 40.0, 0.57, 0.25, 0.28]
-                    ],
-                    "RESIDENTIAL": [
-                        [0.0, 20.0, 0.57, 0.39, 0.43],
-                        [20.1, 40.0, 0.57, 0.25, 0.28]
-                    ],
-                    "SEMIHEATED": [
-                        [0.0, 40.0, 1.22, 0.40, 0.44]
-                    ],
-                },
-            "3C":
-                {
-                    "NONRESIDENTIAL": [
-                        [0.0, 10.0, 1.22, 0.61, 0.67],
-                        [10.1, 30.0, 1.22, 0.39, 0.43],
-                        [30.1, 40.0, 1.22, 0.34, 0.37]
-                    ],
-                    "RESIDENTIAL": [
-                        [0.0, 20.0, 1.22, 0.61, 0.67],
-                        [20.1, 30.0, 1.22, 0.39, 0.43],
-                        [30.1, 40.0, 1.22, 0.34, 0.37]
-                    ],
-                    "SEMIHEATED": [
-                        [0.0, 40.0, 1.22, 0.40, 0.44]
-                    ],
-                },
-            "4A_4B_4C":
-                {
-                    "NONRESIDENTIAL": [
-                        [0.0, 40.0, 0.57, 0.39, 0.43]
-                    ],
-                    "RESIDENTIAL": [
-                        [0.0, 40.0, 0.57, 0.39, 0.43]
-                    ],
-                    "SEMIHEATED": [
-                        [0.0, 40.0, 1.22, 0.40, 0.44]
-                    ],
-                },
-            "5A_5B_5C":
-                {
-                    "NONRESIDENTIAL": [
-                        [0.0, 10.0, 0.57, 0.49, 0.54],
-                        [10.1, 40.0, 0.57, 0.39, 0.43]
-                    ],
-                    "RESIDENTIAL": [
-                        [0.0, 10.0, 0.57, 0.49, 0.54],
-                        [10.1, 40.0, 0.57, 0.39, 0.43]
-                    ],
-                    "SEMIHEATED": [
-                        [0.0, 40.0, 1.22, 0.40, 0.44]
-                    ],
-                },
-            "6A_6B":
-                {
-                    "NONRESIDENTIAL": [
-                        [0.0, 10.0, 0.57, 0.49, 0.54],
-                        [10.1, 40.0, 0.57, 0.39, 0.43]
-                    ],
-                    "RESIDENTIAL": [
-                        [0.0, 10.0, 0.57, 0.49, 0.54],
-                        [10.1, 40.0, 0.57, 0.39, 0.43]
-                    ],
-                    "SEMIHEATED": [
-                        [0.0, 40.0, 1.22, 0.40, 0.44]
-                    ],
-                },
-            "7":
-                {
-                    "NONRESIDENTIAL": [
-                        [0.0, 40.0, 0.57, 0.49, 0.54]
-                    ],
-                    "RESIDENTIAL": [
-                        [0.0, 40.0, 0.57, 0.49, 0.54]
-                    ],
-                    "SEMIHEATED": [
-                        [0.0, 40.0, 1.22, 0.40, 0.44]
-                    ],
-                },
-            "8":
-                {
-                    "NONRESIDENTIAL": [
-                        [0.0, 40.0, 0.46, 0.40, 0.44]
-                    ],
-                    "RESIDENTIAL": [
-                        [0.0, 40.0, 0.46, 0.40, 0.44]
-                    ],
-                    "SEMIHEATED": [
-                        [0.0, 40.0, 1.22, 0.40, 0.44]
-                    ],
-                }
-        }
-
-        combined_climate_zone = table_g_4_climate_zone_lookup[self.user.climate_zone]
-        for thermal_block in self.baseline.Building.ThermalBlocks:
-            print(f"  For thermal block{thermal_block.name}")
-            if thermal_block.building_area_type == "MULTIFAMILY":
-                space_conditioning_category = "RESIDENTIAL"
-            elif thermal_block.building_area_type == "WAREHOUSE":
-                space_conditioning_category = "SEMIHEATED"
-            else:
-                space_conditioning_category = "NONRESIDENTIAL"
-            for exterior_above_grade_wall in thermal_block.ExteriorAboveGradeWalls:
-                fenestration_percentage = exterior_above_grade_wall.vertical_fenestration_percentage
-                if fenestration_percentage > 40:
-                    fenestration_percentage = 40
-                criteria_options = table_g3_4_fenestration_assembly[combined_climate_zone][space_conditioning_category]
-                expected_u_all, expected_shgc_all, expected_vt_all = 0, 0, 0
-                for criteria_option in criteria_options:
-                    low, high, expected_u_all, expected_shgc_all, expected_vt_all = criteria_option
-                    if low < fenestration_percentage < high:
-                        break
-                for fenestration_assembly in exterior_above_grade_wall.FenestrationAssemblies:
-                    if fenestration_assembly.u_factor == expected_u_all:
-                        print(f"  Yes, baseline fenestration U factor {expected_u_all} as expected.")
-                    else:
-                        print(f"  No, baseline fenestration U factor {fenestration_assembly.u_factor} does not match expected fenestration U factor {expected_u_all}")
-                        self.proposed_err = True
-                    if fenestration_assembly.solar_heat_gain_coefficient == expected_shgc_all:
-                        print(f"  Yes, baseline fenestration SHGC {expected_shgc_all} as expected.")
-                    else:
-                        print(f"  No, baseline fenestration SHGC {fenestration_assembly.solar_heat_gain_coefficient} does not match expected fenestration SHGC {expected_shgc_all}")
-                        self.proposed_err = True
-                    if fenestration_assembly.visible_transmittance == expected_vt_all:
-                        print(f"  Yes, baseline fenestration VT {expected_vt_all} as expected.")
-                    else:
-                        print(f"  No, baseline fenestration VT {fenestration_assembly.visible_transmittance} does not match expected fenestration VT {expected_vt_all}")
-                        self.proposed_err = True
-
-        # remove changing portions to see if rest is the same
-        altered_user = deepcopy(self.user.Building.ThermalBlocks)
-        for thermal_block in altered_user:
-            for exterior_above_grade_wall in thermal_block.ExteriorAboveGradeWalls:
-                for fenestration_assembly in exterior_above_grade_wall.FenestrationAssemblies:
-                    fenestration_assembly.u_factor = 0
-                    fenestration_assembly.solar_heat_gain_coefficient = 0
-                    fenestration_assembly.visible_transmittance = 0
-        altered_baseline = deepcopy(self.baseline.Building.ThermalBlocks)
-        for thermal_block in altered_baseline:
-            for exterior_above_grade_wall in thermal_block.ExteriorAboveGradeWalls:
-                for fenestration_assembly in exterior_above_grade_wall.FenestrationAssemblies:
-                    fenestration_assembly.u_factor = 0
-                    fenestration_assembly.solar_heat_gain_coefficient = 0
-                    fenestration_assembly.visible_transmittance = 0
-        if altered_user == altered_baseline:
-            print("  Yes, the other portions of baseline ThermalBlocks matches user")
-        else:
-            print("  No, the other portions of baseline ThermalBlocks does not match user")
-            self.baseline_err = True
-
-        # user and proposed should match
-        if self.user.Building.ThermalBlocks == self.proposed.Building.ThermalBlocks:
-            print("  Yes, proposed ThermalBlocks matches user")
-        else:
-            print("  No, proposed ThermalBlocks does not match user")
-            self.proposed_err = True
-
-    @staticmethod
-    def nearly_equal(a, b, acceptable_range):
-        absolute_difference = abs(a - b)
-        # print(f"the absolute difference is {absolute_difference} and range {range}")
-        # print(f"so the nearly equal is {absolute_difference < range}")
-        return absolute_difference < acceptable_range
+        if sink is not None:
+            sink.write(self, rules_checked, results)
+        return results
+
+    def store_result(self, rule_id, verbose, stage_hashes, result):
+        self.rule_results[rule_id, verbose] = result
+        if stage_hashes is not None:
+            self.result_cache.put(rule_id, verbose, stage_hashes, result)
+
+    def run_fail_fast(self, rules_to_check, results_by_id, rule_ids_to_run, verbose, stage_hashes):
+        # rules with results already at hand go first, then the others by estimated cost; returns the ids
+        # of the rules checked, the last of them failed unless all passed
+        rules_checked = []
+        for rule_id in rules_to_check:
+            if rule_id in results_by_id:
+                rules_checked.append(rule_id)
+                if not (results_by_id[rule_id].proposed_passed and results_by_id[rule_id].baseline_passed):
+                    return rules_checked
+        for rule_id in sorted(rule_ids_to_run, key=lambda rule_id: rule_cost(RULES[rule_id], self)):
+            result = run_rule(RULES[rule_id], self, verbose, fail_fast=True)
+            results_by_id[rule_id] = result
+            rules_checked.append(rule_id)
+            if not (result.proposed_passed and result.baseline_passed):
+                # a result cut short at its first failure is not kept for later checks
+                return rules_checked
+            self.store_result(rule_id, verbose, stage_hashes, result)
+        return rules_checked
@@ -0,0 +1,149 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from maskeddiff import diff_paths, is_array, resolve_pointer, split_pointer
+from results import FirstFailure, RuleResult
+from instrumentation import timed
+
+Rule = namedtuple("Rule", ["rule_id", "function", "reads", "compares", "baseline_allowed_differences"])
+
+# every registered rule by id, in registration order
+RULES = {}
+
+# set by init_worker in each process of a process pool
+worker_triplet = None
+
+# the compared section is walked in each of the three stages
+COMPARE_COST = 3
+
+
+def rule(rule_id, reads, compares=None, baseline_allowed_differences=()):
+    # reads are the pointers of the RMR sections the rule looks at, compares is the section where
+    # everything except the baseline_allowed_differences pointers must match between the stages
+    def register(function):
+        RULES[rule_id] = Rule(rule_id, function, tuple(reads), compares, tuple(baseline_allowed_differences))
+        return function
+    return register
+
+
+def depends_on(rule_to_check, changed_pointer):
+    # a change at, below or above one of the sections the rule reads or compares
+    changed_tokens = split_pointer(changed_pointer)
+    sections = rule_to_check.reads if rule_to_check.compares is None else rule_to_check.reads + (rule_to_check.compares,)
+    for section_pointer in sections:
+        section_tokens = split_pointer(section_pointer)
+        length = min(len(section_tokens), len(changed_tokens))
+        if section_tokens[:length] == changed_tokens[:length]:
+            return True
+    return False
+
+
+def affected_rules(rule_ids, changed_pointers):
+    return [rule_id for rule_id in rule_ids
+            if any(depends_on(RULES[rule_id], changed_pointer) for changed_pointer in changed_pointers)]
+
+
+def value_at(document, pointer):
+    try:
+        return resolve_pointer(document, pointer)
+    except (KeyError, IndexError, ValueError):
+        return None
+
+
+def compare_to_user(rmr_triplet, result, section_pointer, baseline_allowed_paths):
+    section_path = tuple(split_pointer(section_pointer))
+    section_name = section_path[-1]
+    user_section = resolve_pointer(rmr_triplet.user, section_pointer)
+
+    # remove changing portions to see if rest is the same
+    differences = diff_paths(user_section, resolve_pointer(rmr_triplet.baseline, section_pointer),
+                             baseline_allowed_paths, section_pointer)
+    if not differences:
+        result.passed(section_path, "  Yes, the other portions of baseline {section} matches user", section=section_name)
+    else:
+        result.info(section_path, "  No, the other portions of baseline {section} does not match user",
+                    section=section_name)
+        for difference in differences:
+            result.failed("BASELINE", tuple(split_pointer(difference)), "    differs at {pointer}",
+                          value_at(rmr_triplet.user, difference), value_at(rmr_triplet.baseline, difference))
+
+    # user and proposed should match
+    differences = diff_paths(user_section, resolve_pointer(rmr_triplet.proposed, section_pointer), (), section_pointer)
+    if not differences:
+        result.passed(section_path, "  Yes, proposed {section} matches user", section=section_name)
+    else:
+        result.info(section_path, "  No, proposed {section} does not match user", section=section_name)
+        for difference in differences:
+            result.failed("PROPOSED", tuple(split_pointer(difference)), "    differs at {pointer}",
+                          value_at(rmr_triplet.user, difference), value_at(rmr_triplet.proposed, difference))
+
+
+def read_elements(rule_to_run, rmr_triplet):
+    # items in the baseline arrays the rule reads
+    sections = [value_at(rmr_triplet.baseline, pointer) for pointer in rule_to_run.reads]
+    return sum(len(section) for section in sections if is_array(section))
+
+
+def nested_items(value):
+    # items of the arrays anywhere below value
+    if is_array(value):
+        return sum(1 + nested_items(item) for item in value)
+    if hasattr(value, "keys"):
+        return sum(nested_items(value[key]) for key in value.keys())
+    return 0
+
+
+def section_cost(section):
+    # items of the section times the items nested in its first one, which samples how deep each item goes
+    if not is_array(section):
+        return 1
+    if not len(section):
+        return 0
+    return len(section) * (1 + nested_items(section[0]))
+
+
+def rule_cost(rule_to_run, rmr_triplet):
+    # estimate from the baseline sections the rule reads and the section it compares
+    cost = sum(section_cost(value_at(rmr_triplet.baseline, pointer)) for pointer in rule_to_run.reads)
+    if rule_to_run.compares is not None:
+        cost += COMPARE_COST * section_cost(value_at(rmr_triplet.baseline, rule_to_run.compares))
+    return cost
+
+
+def run_rule(rule_to_run, rmr_triplet, verbose=True, fail_fast=False):
+    # with fail_fast the rule stops at its first failure and the result holds the records up to it
+    result = RuleResult(rule_to_run.rule_id, verbose, fail_fast)
+    try:
+        with timed("evaluate", rule_to_run.rule_id, lambda: read_elements(rule_to_run, rmr_triplet)):
+            rule_to_run.function(rmr_triplet, result)
+        if rule_to_run.compares is not None:
+            with timed("compare", rule_to_run.rule_id):
+                compare_to_user(rmr_triplet, result, rule_to_run.compares, rule_to_run.baseline_allowed_differences)
+    except FirstFailure:
+        pass
+    return result
+
+
+def init_worker(rmr_triplet):
+    global worker_triplet
+    worker_triplet = rmr_triplet
+
+
+def run_rule_in_worker(rule_to_run, verbose):
+    return run_rule(rule_to_run, worker_triplet, verbose)
+
+
+def run_rules(rules_to_run, rmr_triplet, executor=None, max_workers=None, verbose=True):
+    # executor is None to run serially, "thread" or "process", results keep the order of rules_to_run
+    if executor is None:
+        return [run_rule(rule_to_run, rmr_triplet, verbose) for rule_to_run in rules_to_run]
+    if executor == "thread":
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(run_rule, rules_to_run, [rmr_triplet] * len(rules_to_run),
+                                 [verbose] * len(rules_to_run)))
+    if executor == "process":
+        # the triplet is sent once to each worker rather than once per rule
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker,
+                                 initargs=(rmr_triplet,)) as pool:
+            return list(pool.map(run_rule_in_worker, rules_to_run, [verbose] * len(rules_to_run)))
+    raise ValueError(f"unknown executor {executor}, expected None, 'thread' or 'process'")
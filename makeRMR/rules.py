@@ -0,0 +1,310 @@
+from ruleregistry import rule
+from columnar import choose, evaluate, extract_columns, numbers, to_list, true_indices
+from systemindex import SERVED_BY_KEY
+from tables import (climate_zones_0_to_3, fenestration_criteria, section_g3_1_2_9_mapping, select_motor_efficiency,
+                    table_g3_1_1_1, table_g3_1_1_3, table_g3_1_2_9_mapping, table_g3_6)
+
+# Standard 229 checks on an RmrTriplet, each registered with the RMR sections it reads
+
+
+def nearly_equal(a, b, acceptable_range):
+    absolute_difference = abs(a - b)
+    return absolute_difference < acceptable_range
+
+
+@rule("6a_1", reads=["/ExteriorLightingAreas"], compares="/ExteriorLightingAreas",
+      baseline_allowed_differences=["/ExteriorLightingAreas/*/power"])
+def check_exterior_lights_6a_1(rmr_triplet, result):
+    # Last paragraph of baseline side of Table G3.1 part 6 and Table G3.6
+    columns = extract_columns(rmr_triplet.baseline.ExteriorLightingAreas, ["name", "category", "area", "power"])
+    criteria = [table_g3_6[category] for category in columns["category"]]
+    checked = [status == "tradable" and units == "W/sqft" for status, multiplier, units in criteria]
+    expected_powers = evaluate(lambda area, multiplier: area * multiplier, numbers(columns["area"]),
+                               numbers([multiplier for status, multiplier, units in criteria]))
+    power_differs = to_list(evaluate(lambda power, expected_power: power != expected_power,
+                                     numbers(columns["power"]), expected_powers))
+    expected_powers = to_list(expected_powers)
+
+    # without verbose records only the failing areas are visited again
+    if result.verbose:
+        indices = range(len(criteria))
+    else:
+        indices = [index for index in true_indices(power_differs) if checked[index]]
+    for index in indices:
+        path = ("ExteriorLightingAreas", index)
+        result.info(path, "Confirming rule 6a_1 for {name}", name=columns["name"][index])
+        status, multiplier, units = criteria[index]
+        if status == "tradable":
+            if units == "W/sqft":
+                if power_differs[index]:
+                    result.failed("BASELINE", path + ("power",), "  No, invalid power found: {actual} but expected {expected}",
+                                  expected_powers[index], columns["power"][index])
+                else:
+                    result.passed(path + ("power",), "  Yes, power same as expected: {expected}",
+                                  expected_powers[index], columns["power"][index])
+            else:
+                result.not_checked(path, "  Rule not checked except for W/sqft tradable areas.")
+        else:
+            result.not_checked(path, "  Non-tradable area rules not yet checked.")
+
+
+@rule("18a_1", reads=["/climate_zone", "/Building/ThermalBlocks", "/Building/HeatingVentilationAirConditioningSystems"],
+      compares="/Building/HeatingVentilationAirConditioningSystems",
+      baseline_allowed_differences=["/Building/HeatingVentilationAirConditioningSystems/*/hvac_system_type"])
+def check_system_selection_18a_1(rmr_triplet, result):
+    # G3.1.1a, table G3.1.1-3, table G3.1.1-4
+
+    building_summary = rmr_triplet.building_summary("user")
+    total_area = building_summary.total_floor_area
+    highest_floor = building_summary.highest_floor
+    first_building_area_type = building_summary.first_building_area_type
+
+    if not building_summary.all_area_types_same:
+        result.not_checked(("Building",), "  Rules not checked that apply to buildings with multiple building types.")
+    else:
+        if first_building_area_type != "OFFICE":
+            result.not_checked(("Building",), "  Rules not checked that apply to buildings other than office buildings.")
+        else:
+            building_type_subcategory = "OTHER_NONRESIDENTIAL_MEDIUM"
+            if total_area < 25000 and highest_floor <= 3:
+                building_type_subcategory = "OTHER_NONRESIDENTIAL_SMALL"
+            elif total_area > 150000 or highest_floor > 5:
+                building_type_subcategory = "OTHER_NONRESIDENTIAL_LARGE"
+
+            expected_baseline_system, baseline_system_climate_zones_0_to_3a = table_g3_1_1_3[building_type_subcategory]
+            if rmr_triplet.user.climate_zone in climate_zones_0_to_3:
+                expected_baseline_system = baseline_system_climate_zones_0_to_3a
+
+            system_index = rmr_triplet.system_index("baseline")
+            for block_index, key in system_index.miskeyed_references:
+                result.info(("Building", "ThermalBlocks", block_index, key),
+                            "  Thermal block {block} names its HVAC systems with {key} instead of {served_by_key}",
+                            block=block_index, key=key, served_by_key=SERVED_BY_KEY)
+            for block_index, tag in system_index.dangling_references:
+                result.info(("Building", "ThermalBlocks", block_index), "  Thermal block {block} is served by {tag} which is not an HVAC system",
+                            block=block_index, tag=tag)
+            for index, tag in system_index.duplicate_tags:
+                result.info(("Building", "HeatingVentilationAirConditioningSystems", index, "tag"),
+                            "  HVAC system {index} repeats the tag {tag} of HVAC system {first}",
+                            index=index, tag=tag, first=system_index.systems_by_tag[tag][0])
+
+            hvac_systems = rmr_triplet.baseline.Building.HeatingVentilationAirConditioningSystems
+            for index, hvac_system in enumerate(hvac_systems):
+                path = ("Building", "HeatingVentilationAirConditioningSystems", index, "hvac_system_type")
+                result.info(path, "Confirming rule 18a_1 for {tag}", tag=hvac_system.tag)
+                if hvac_system.hvac_system_type == expected_baseline_system:
+                    result.passed(path, "  Yes, baseline HVAC system: {actual} matches expected for {tag}",
+                                  expected_baseline_system, hvac_system.hvac_system_type, tag=hvac_system.tag)
+                else:
+                    result.failed("PROPOSED", path, "  No, baseline HVAC system {actual} does not match expected {expected} for {tag}",
+                                  expected_baseline_system, hvac_system.hvac_system_type, tag=hvac_system.tag)
+
+
+@rule("19v_4", reads=["/Building/HeatingVentilationAirConditioningSystems"],
+      compares="/Building/HeatingVentilationAirConditioningSystems",
+      baseline_allowed_differences=["/Building/HeatingVentilationAirConditioningSystems/*/electric_power_to_fan_motor",
+                                    "/Building/HeatingVentilationAirConditioningSystems/*/fan_brake_horsepower"])
+def check_fan_power_19v_4(rmr_triplet, result):
+    # G3.1.2.9 System Fan Power, Table G3.1.2.9, Table G3.9.1
+    # Users Manual for 90.1-2016 - Example G-M
+
+    columns = extract_columns(rmr_triplet.baseline.Building.HeatingVentilationAirConditioningSystems,
+                              ["tag", "hvac_system_type", "design_supply_fan_airflow_rate", "fan_brake_horsepower",
+                               "electric_power_to_fan_motor"])
+    methods = [section_g3_1_2_9_mapping[hvac_system_type] for hvac_system_type in columns["hvac_system_type"]]
+    # fan power related to non-mechanical cooling is checked as CFMs
+    uses_cfms = [method in ("CFMs", "CFMsPlusNonMechanicalCooling") for method in methods]
+    uses_bhp = [method == "bhp/fan motor efficiency" for method in methods]
+    airflow_rates = numbers(columns["design_supply_fan_airflow_rate"])
+    supply_volume_multipliers = numbers([table_g3_1_2_9_mapping[hvac_system_type] if bhp else None
+                                         for hvac_system_type, bhp in zip(columns["hvac_system_type"], uses_bhp)])
+    expected_brake_horse_powers = evaluate(lambda multiplier, airflow_rate: multiplier * airflow_rate,
+                                           supply_volume_multipliers, airflow_rates)
+    brake_horse_power_matches = to_list(evaluate(lambda actual, expected: nearly_equal(actual, expected, 0.5),
+                                                 numbers(columns["fan_brake_horsepower"]), expected_brake_horse_powers))
+    expected_brake_horse_powers = to_list(expected_brake_horse_powers)
+    motor_selections = [select_motor_efficiency(brake_horse_power) if bhp else (0, 95)
+                        for brake_horse_power, bhp in zip(expected_brake_horse_powers, uses_bhp)]
+    expected_powers = choose(uses_bhp,
+                             evaluate(lambda brake_horse_power, motor_efficiency: brake_horse_power * 0.746 / (motor_efficiency / 100),
+                                      numbers(expected_brake_horse_powers), numbers([efficiency for limit, efficiency in motor_selections])),
+                             choose(uses_cfms, evaluate(lambda airflow_rate: 0.3 * airflow_rate, airflow_rates), numbers([0] * len(methods))))
+    power_matches = to_list(evaluate(lambda actual, expected: nearly_equal(actual, expected, 0.5),
+                                     numbers(columns["electric_power_to_fan_motor"]), expected_powers))
+    expected_powers = to_list(expected_powers)
+
+    # without verbose records only the failing systems are visited again
+    if result.verbose:
+        indices = range(len(methods))
+    else:
+        indices = [index for index in range(len(methods))
+                   if not power_matches[index] or not (uses_bhp[index] or uses_cfms[index])
+                   or (uses_bhp[index] and not brake_horse_power_matches[index])]
+    for index in indices:
+        path = ("Building", "HeatingVentilationAirConditioningSystems", index)
+        tag = columns["tag"][index]
+        result.info(path, "Confirming rule 19v_4 for {tag}", tag=tag)
+        if methods[index] == "CFMsPlusNonMechanicalCooling":
+            result.not_checked(path, "  Rules not checked for fan power related to non-mechanical cooling.")
+
+        if uses_bhp[index]:
+            expected_brake_horse_power = expected_brake_horse_powers[index]
+            if brake_horse_power_matches[index]:
+                result.passed(path + ("fan_brake_horsepower",), "  Yes, fan break horsepower {actual} nearly same as expected: {expected}",
+                              expected_brake_horse_power, columns["fan_brake_horsepower"][index])
+            else:
+                result.failed("BASELINE", path + ("fan_brake_horsepower",), "  No, invalid fan break horsepower: {actual} but expected {expected}",
+                              expected_brake_horse_power, columns["fan_brake_horsepower"][index])
+
+            shaft_input_power_selected, motor_efficiency = motor_selections[index]
+            if shaft_input_power_selected != 0:
+                result.info(path, "  Motor efficiency of {motor_efficiency} selected based {shaft_input_power} which is next larger from {brake_horsepower}",
+                            motor_efficiency=motor_efficiency, shaft_input_power=shaft_input_power_selected,
+                            brake_horsepower=expected_brake_horse_power)
+            else:
+                result.info(path, "  Look up of motor efficiency did not work for {tag} with a size of {brake_horsepower} so selecting 95%",
+                            tag=tag, brake_horsepower=expected_brake_horse_power)
+            result.not_checked(path, "  Rules not checked related to A adjustment from Section 6.5.3.1.1 for {tag}", tag=tag)
+        elif not uses_cfms[index]:
+            result.failed("PROPOSED", path, "  No, unknown fan power calculation method")
+
+        if power_matches[index]:
+            result.passed(path + ("electric_power_to_fan_motor",), "  Yes, power {actual} nearly same as expected: {expected}",
+                          expected_powers[index], columns["electric_power_to_fan_motor"][index])
+        else:
+            result.failed("BASELINE", path + ("electric_power_to_fan_motor",), "  No, invalid power found: {actual} but expected {expected}",
+                          expected_powers[index], columns["electric_power_to_fan_motor"][index])
+
+
+@rule("5c_1", reads=["/Building/ThermalBlocks"], compares="/Building/ThermalBlocks",
+      baseline_allowed_differences=["/Building/ThermalBlocks/*/ExteriorAboveGradeWalls/*/vertical_fenestration_percentage"])
+def vertical_fenestration_percentage_5c_1(rmr_triplet, result):
+    # Table G3.1 Part 5 - Baseline paragraph (c)
+    # Table G3.1.1-1
+    user_summary = rmr_triplet.building_summary("user")
+    user_total_floor_area = user_summary.total_floor_area
+    user_total_wall_area = user_summary.total_wall_area
+    user_total_fenestration_area = user_summary.total_fenestration_area
+    first_building_area_type = user_summary.first_building_area_type
+    user_overall_fenestration_fraction = user_summary.fenestration_fraction
+
+    result.info(("Building",), "  User total floor area:              {value}", value=user_total_floor_area)
+    result.info(("Building",), "  User total wall area:               {value}", value=user_total_wall_area)
+    result.info(("Building",), "  User total fenestration area:       {value}", value=user_total_fenestration_area)
+    result.info(("Building",), "  User overall fenestration fraction: {value}", value=user_overall_fenestration_fraction)
+
+    if not user_summary.all_area_types_same:
+        result.not_checked(("Building",), "  Rules not checked that apply to buildings with multiple building types.")
+    else:
+        if first_building_area_type == "OFFICE":
+            if user_total_floor_area <= 5000:
+                first_building_area_type = "OFFICE_SMALL"
+            elif user_total_floor_area > 50000:
+                first_building_area_type = "OFFICE_LARGE"
+            else:
+                first_building_area_type = "OFFICE_MEDIUM"
+
+        if first_building_area_type in table_g3_1_1_1.keys():
+            expected_fenestration_fraction = table_g3_1_1_1[first_building_area_type]
+            result.info(("Building",), "  The expected fenestration fraction is {fraction} for building type {building_type}",
+                        fraction=expected_fenestration_fraction, building_type=first_building_area_type)
+            expected_total_fenestration_area = expected_fenestration_fraction * user_total_wall_area
+            baseline_total_fenestration_area = rmr_triplet.building_summary("baseline").total_fenestration_area
+            if nearly_equal(expected_total_fenestration_area, baseline_total_fenestration_area, 1):
+                result.passed(("Building", "ThermalBlocks"), "  Yes, baseline fenestration area {actual} as expected.",
+                              expected_total_fenestration_area, baseline_total_fenestration_area)
+            else:
+                result.failed("PROPOSED", ("Building", "ThermalBlocks"),
+                              "  No, baseline fenestration area {actual} does not match expected fenestration area {expected}",
+                              expected_total_fenestration_area, baseline_total_fenestration_area)
+        else:
+            result.not_checked(("Building",), "  Rules not checked that apply to buildings with building type: {building_type}",
+                               building_type=first_building_area_type)
+
+
+@rule("5h_1", reads=["/climate_zone", "/Building/ThermalBlocks"], compares="/Building/ThermalBlocks",
+      baseline_allowed_differences=[
+          "/Building/ThermalBlocks/*/ExteriorAboveGradeWalls/*/FenestrationAssemblies/*/u_factor",
+          "/Building/ThermalBlocks/*/ExteriorAboveGradeWalls/*/FenestrationAssemblies/*/solar_heat_gain_coefficient",
+          "/Building/ThermalBlocks/*/ExteriorAboveGradeWalls/*/FenestrationAssemblies/*/visible_transmittance"])
+def vertical_fenestration_assembly_5h_1(rmr_triplet, result):
+    # Table G3.1 Part 5 - Baseline paragraph (d) Vertical Fenestration Assemblies
+    # Table G3.4-4 Envelope for Climate Zones 4 (A,B,C)
+    climate_zone = rmr_triplet.user.climate_zone
+    block_names = []
+    assemblies = {"path": [], "block_index": [], "u_factor": [], "solar_heat_gain_coefficient": [],
+                  "visible_transmittance": [], "expected_u": [], "expected_shgc": [], "expected_vt": []}
+    for block_index, thermal_block in enumerate(rmr_triplet.baseline.Building.ThermalBlocks):
+        block_names.append(thermal_block.name)
+        if thermal_block.building_area_type == "MULTIFAMILY":
+            space_conditioning_category = "RESIDENTIAL"
+        elif thermal_block.building_area_type == "WAREHOUSE":
+            space_conditioning_category = "SEMIHEATED"
+        else:
+            space_conditioning_category = "NONRESIDENTIAL"
+        for wall_index, exterior_above_grade_wall in enumerate(thermal_block.ExteriorAboveGradeWalls):
+            fenestration_percentage = exterior_above_grade_wall.vertical_fenestration_percentage
+            if fenestration_percentage > 40:
+                fenestration_percentage = 40
+            expected_u_all, expected_shgc_all, expected_vt_all = fenestration_criteria(
+                climate_zone, space_conditioning_category, fenestration_percentage)
+            for assembly_index, fenestration_assembly in enumerate(exterior_above_grade_wall.FenestrationAssemblies):
+                assemblies["path"].append(("Building", "ThermalBlocks", block_index, "ExteriorAboveGradeWalls", wall_index,
+                                           "FenestrationAssemblies", assembly_index))
+                assemblies["block_index"].append(block_index)
+                for field in ["u_factor", "solar_heat_gain_coefficient", "visible_transmittance"]:
+                    assemblies[field].append(fenestration_assembly.get(field))
+                assemblies["expected_u"].append(expected_u_all)
+                assemblies["expected_shgc"].append(expected_shgc_all)
+                assemblies["expected_vt"].append(expected_vt_all)
+
+    def matches(actual, expected):
+        return actual == expected
+
+    u_matches = to_list(evaluate(matches, numbers(assemblies["u_factor"]), numbers(assemblies["expected_u"])))
+    shgc_matches = to_list(evaluate(matches, numbers(assemblies["solar_heat_gain_coefficient"]),
+                                    numbers(assemblies["expected_shgc"])))
+    vt_matches = to_list(evaluate(matches, numbers(assemblies["visible_transmittance"]), numbers(assemblies["expected_vt"])))
+
+    # without verbose records only the failing assemblies are visited again
+    if result.verbose:
+        indices = range(len(u_matches))
+    else:
+        indices = [index for index in range(len(u_matches))
+                   if not (u_matches[index] and shgc_matches[index] and vt_matches[index])]
+    next_block_index = 0
+    for index in indices:
+        block_index = assemblies["block_index"][index]
+        while result.verbose and next_block_index <= block_index:
+            result.info(("Building", "ThermalBlocks", next_block_index), "  For thermal block{name}",
+                        name=block_names[next_block_index])
+            next_block_index += 1
+        path = assemblies["path"][index]
+        expected_u_all = assemblies["expected_u"][index]
+        expected_shgc_all = assemblies["expected_shgc"][index]
+        expected_vt_all = assemblies["expected_vt"][index]
+        if u_matches[index]:
+            result.passed(path + ("u_factor",), "  Yes, baseline fenestration U factor {expected} as expected.",
+                          expected_u_all, assemblies["u_factor"][index])
+        else:
+            result.failed("PROPOSED", path + ("u_factor",),
+                          "  No, baseline fenestration U factor {actual} does not match expected fenestration U factor {expected}",
+                          expected_u_all, assemblies["u_factor"][index])
+        if shgc_matches[index]:
+            result.passed(path + ("solar_heat_gain_coefficient",), "  Yes, baseline fenestration SHGC {expected} as expected.",
+                          expected_shgc_all, assemblies["solar_heat_gain_coefficient"][index])
+        else:
+            result.failed("PROPOSED", path + ("solar_heat_gain_coefficient",),
+                          "  No, baseline fenestration SHGC {actual} does not match expected fenestration SHGC {expected}",
+                          expected_shgc_all, assemblies["solar_heat_gain_coefficient"][index])
+        if vt_matches[index]:
+            result.passed(path + ("visible_transmittance",), "  Yes, baseline fenestration VT {expected} as expected.",
+                          expected_vt_all, assemblies["visible_transmittance"][index])
+        else:
+            result.failed("PROPOSED", path + ("visible_transmittance",),
+                          "  No, baseline fenestration VT {actual} does not match expected fenestration VT {expected}",
+                          expected_vt_all, assemblies["visible_transmittance"][index])
+    while result.verbose and next_block_index < len(block_names):
+        result.info(("Building", "ThermalBlocks", next_block_index), "  For thermal block{name}",
+                    name=block_names[next_block_index])
+        next_block_index += 1
@@ -0,0 +1,182 @@
+import json
+import fastjsonschema
+
+from maskeddiff import join_pointer, split_pointer
+from validatorcache import DEFAULT_CACHE_DIR, compile_cached
+
+
+def load_schema(schema_file_name):
+    with open(schema_file_name) as schema_file:
+        return json.load(schema_file)
+
+
+def definition_schema(schema, definition_name):
+    # stand alone schema for one of the definitions that can still resolve $ref to the others,
+    # it keeps the $id of the document so the compiler resolves refs locally
+    return {"$schema": schema.get("$schema"),
+            "$id": schema.get("$id", ""),
+            "$ref": "#/definitions/" + definition_name,
+            "definitions": schema.get("definitions", {})}
+
+
+def find_item_arrays(schema_node, keys=()):
+    # arrays of "$ref" items inside an object, found through inline objects like Building
+    item_arrays = []
+    for key, property_schema in schema_node.get("properties", {}).items():
+        if property_schema.get("type") == "array" and "$ref" in property_schema.get("items", {}):
+            definition_name = property_schema["items"]["$ref"].split("/")[-1]
+            item_arrays.append((keys + (key,), definition_name))
+        elif property_schema.get("type") == "object":
+            item_arrays.extend(find_item_arrays(property_schema, keys + (key,)))
+    return item_arrays
+
+
+def is_below(pointer, ancestor_pointer):
+    # pointer is ancestor_pointer or inside it
+    return pointer == ancestor_pointer or pointer.startswith(ancestor_pointer + "/")
+
+
+def error_record(err, pointer):
+    for token in err.path[1:]:
+        pointer = join_pointer(pointer, token)
+    return {"path": pointer, "message": err.message, "value": err.value, "rule": err.rule,
+            "rule_definition": err.rule_definition}
+
+
+class SchemaValidationError(ValueError):
+    # schema errors found in instances before any rule ran, errors_by_file holds the error records
+
+    def __init__(self, errors_by_file):
+        self.errors_by_file = errors_by_file
+        file_name, errors = next(iter(errors_by_file.items()))
+        error_count = sum(len(file_errors) for file_errors in errors_by_file.values())
+        ValueError.__init__(self, f"{error_count} schema errors, the first in {file_name} at "
+                                  f"{errors[0]['path'] or '/'}: {errors[0]['message']}")
+
+
+class SchemaValidators(object):
+    # the compiled schema plus one compiled validator per definition, so that errors can be
+    # collected for every array item instead of stopping at the first one in the document;
+    # the validators do not stop at the first error either, every error of an object is reported
+
+    def __init__(self, schema, cache_dir=DEFAULT_CACHE_DIR):
+        self.schema = schema
+        self.validators = {"": compile_cached(schema, cache_dir, fast_fail=False)}
+        self.item_arrays = {"": find_item_arrays(schema)}
+        for definition_name, definition in schema.get("definitions", {}).items():
+            self.validators[definition_name] = compile_cached(definition_schema(schema, definition_name), cache_dir,
+                                                              fast_fail=False)
+            self.item_arrays[definition_name] = find_item_arrays(definition)
+
+    def __call__(self, instance):
+        return self.validators[""](instance)
+
+    def errors(self, instance, definition_name="", pointer=""):
+        try:
+            self.validators[definition_name](instance)
+            return []
+        except fastjsonschema.JsonSchemaException:
+            pass
+        return self.collect_errors(instance, definition_name, pointer)
+
+    def collect_errors(self, instance, definition_name, pointer):
+        # validate the object with its item arrays emptied, then each item against its definition
+        errors = self.object_errors(instance, definition_name, pointer)
+        for keys, item_definition_name in self.item_arrays[definition_name]:
+            items = self.items_at(instance, keys)
+            if items:
+                items_pointer = pointer
+                for key in keys:
+                    items_pointer = join_pointer(items_pointer, key)
+                for index, item in enumerate(items):
+                    errors.extend(self.errors(item, item_definition_name, join_pointer(items_pointer, index)))
+        return errors
+
+    @staticmethod
+    def items_at(instance, keys):
+        items = instance
+        for key in keys:
+            items = items.get(key) if isinstance(items, dict) else None
+        return items if isinstance(items, list) else None
+
+    def object_errors(self, instance, definition_name, pointer):
+        # the errors of the object itself with its item arrays emptied
+        stripped = instance
+        for keys, item_definition_name in self.item_arrays[definition_name]:
+            if self.items_at(instance, keys):
+                stripped = self.strip(stripped, keys)
+        try:
+            self.validators[definition_name](stripped)
+        except fastjsonschema.JsonSchemaValuesException as err:
+            return [error_record(error, pointer) for error in err.errors]
+        except fastjsonschema.JsonSchemaValueException as err:
+            return [error_record(err, pointer)]
+        return []
+
+    def locate(self, pointer):
+        # (order, unit length, definition name, keys) where the unit is the innermost array item, or the
+        # document, holding pointer and keys lead from it to pointer; order has the position of the item
+        # array and the index for each item on the way, which sorts errors as errors() finds them
+        order = ()
+        unit_length = 0
+        definition_name = ""
+        keys = ()
+        for position, token in enumerate(split_pointer(pointer)):
+            item_arrays = [item_keys for item_keys, item_definition_name in self.item_arrays[definition_name]]
+            if keys in item_arrays and token.isdigit():
+                order += ((item_arrays.index(keys), int(token)),)
+                unit_length = position + 1
+                definition_name = self.item_arrays[definition_name][item_arrays.index(keys)][1]
+                keys = ()
+            else:
+                keys += (token,)
+        return order, unit_length, definition_name, keys
+
+    def unit_of(self, pointer):
+        # (pointer, definition name, deep) of the unit holding pointer, deep is False when the change is in
+        # the unit's own values so its items need no validation
+        order, unit_length, definition_name, keys = self.locate(pointer)
+        deep = any(item_keys[:len(keys)] == keys for item_keys, item_definition_name in self.item_arrays[definition_name])
+        unit_pointer = ""
+        for token in split_pointer(pointer)[:unit_length]:
+            unit_pointer = join_pointer(unit_pointer, token)
+        return unit_pointer, definition_name, deep
+
+    def revalidate(self, errors, changed_pointers, value_at):
+        # errors of a document that had errors before and changed at changed_pointers, found by validating
+        # only the items holding the changes; value_at(pointer) gives the plain value at a pointer
+        units = {}
+        for changed_pointer in changed_pointers:
+            unit_pointer, definition_name, deep = self.unit_of(changed_pointer)
+            units[unit_pointer] = (definition_name, deep or units.get(unit_pointer, (None, False))[1])
+        deep_pointers = [unit_pointer for unit_pointer, (definition_name, deep) in units.items() if deep]
+        for unit_pointer in sorted(units):
+            if any(is_below(unit_pointer, deep_pointer) and unit_pointer != deep_pointer for deep_pointer in deep_pointers):
+                # validated with a deep unit around it
+                continue
+            definition_name, deep = units[unit_pointer]
+            # a shallow unit leaves the errors of its items alone
+            item_pointers = ()
+            if deep:
+                unit_errors = self.errors(value_at(unit_pointer), definition_name, unit_pointer)
+            else:
+                for keys, item_definition_name in self.item_arrays[definition_name]:
+                    items_pointer = unit_pointer
+                    for key in keys:
+                        items_pointer = join_pointer(items_pointer, key)
+                    item_pointers += (items_pointer + "/",)
+                unit_errors = self.object_errors(value_at(unit_pointer), definition_name, unit_pointer)
+            errors = [error for error in errors
+                      if not (is_below(error["path"], unit_pointer) and not error["path"].startswith(item_pointers))]
+            errors.extend(unit_errors)
+        # in the order errors() gives them, an item's own error before those of its items
+        return sorted(errors, key=lambda error: self.locate(error["path"])[0])
+
+    @staticmethod
+    def strip(instance, keys):
+        stripped = dict(instance)
+        if len(keys) == 1:
+            stripped[keys[0]] = []
+        else:
+            stripped[keys[0]] = SchemaValidators.strip(instance[keys[0]], keys[1:])
+        return stripped
@@ -0,0 +1,68 @@
+# Cross references between thermal blocks and the HVAC systems that serve them, built in one pass over
+# a building so rules look systems and served blocks up by tag instead of scanning for them.
+
+SERVED_BY_KEY = "served_by_heating_ventilation_air_conditioning_systems_tagged"
+
+# misspellings of SERVED_BY_KEY found in RMR files, their references are indexed and reported
+MISKEYED_SERVED_BY_KEYS = ("served_by_hvac_systems_tagged",)
+
+
+def section_items(building, key):
+    # building can be an overlay, a typed record or a streamed object, which has no get; a streamed
+    # array is not tested for truth, that would parse all of it to count its items
+    try:
+        items = building[key]
+    except KeyError:
+        return []
+    return [] if items is None else items
+
+
+class SystemIndex(object):
+
+    def __init__(self, building):
+        # tag to (index, system), tag to [(block index, floor area)] and the floor area each system serves;
+        # blocks are not kept, for streamed stages that would hold every decoded block for good
+        self.systems_by_tag = {}
+        self.blocks_by_tag = {}
+        self.served_floor_areas = {}
+        # (system index, tag) of repeated tags, (block index, tag) of references to no system and
+        # (block index, key) of blocks that use a misspelled key
+        self.duplicate_tags = []
+        self.dangling_references = []
+        self.miskeyed_references = []
+
+        for index, hvac_system in enumerate(section_items(building, "HeatingVentilationAirConditioningSystems")):
+            tag = hvac_system.get("tag")
+            if tag in self.systems_by_tag:
+                self.duplicate_tags.append((index, tag))
+            else:
+                self.systems_by_tag[tag] = (index, hvac_system)
+                self.blocks_by_tag[tag] = []
+                self.served_floor_areas[tag] = 0
+
+        for block_index, thermal_block in enumerate(section_items(building, "ThermalBlocks")):
+            tags = []
+            for key in (SERVED_BY_KEY,) + MISKEYED_SERVED_BY_KEYS:
+                if key != SERVED_BY_KEY and key in thermal_block:
+                    self.miskeyed_references.append((block_index, key))
+                served_by = thermal_block.get(key)
+                if served_by is not None:
+                    tags.extend(served_by)
+            floor_area = thermal_block.get("gross_conditioned_floor_area")
+            if floor_area is None:
+                floor_area = 0
+            for tag in tags:
+                if tag in self.blocks_by_tag:
+                    self.blocks_by_tag[tag].append((block_index, floor_area))
+                    self.served_floor_areas[tag] += floor_area
+                else:
+                    self.dangling_references.append((block_index, tag))
+
+    def system(self, tag):
+        return self.systems_by_tag[tag][1]
+
+    def served_block_indexes(self, tag):
+        return [block_index for block_index, floor_area in self.blocks_by_tag.get(tag, [])]
+
+    def unserved_tags(self):
+        return [tag for tag, blocks in self.blocks_by_tag.items() if not blocks]
@@ -0,0 +1,290 @@
+# Standard 90.1 Appendix G tables used by the rules. They are built once when the module is first
+# imported and the lookups that used to scan a table go through sorted indexes instead.
+from bisect import bisect_left, bisect_right
+
+# part of the key of cached rule results, change it whenever a table value changes
+TABLES_VERSION = "90.1-2016.1"
+
+# Table G3.6
+table_g3_6 = {
+    "PARKING_LOTS_AND_DRIVES": ["tradable", 0.15, "W/sqft"],  # should be 0.15
+    "WALKWAYS_NARROW": ["tradable", 1.0, "W/ft"],
+    "WALKWAYS_WIDE": ["tradable", 0.2, "W/sqft"],
+    "PLAZA_AREAS": ["tradable", 0.2, "W/sqft"],
+    "SPECIAL_FEATURE_AREAS": ["tradable", 0.2, "W/sqft"],
+    "STAIRWAYS": ["tradable", 1.0, "W/sqft"],
+    "MAIN_ENTRIES": ["tradable", 30, "W/ft"],
+    "OTHER_DOORS": ["tradable", 20, "W/ft"],
+    "CANOPIES": ["tradable", 1.25, "W/sqft"],
+    "OPEN_OUTDOOR_SALES": ["tradable", 0.5, "W/sqft"],
+    "STREET_FRONTAGE_VEHICLE_SALES_LOTS": ["tradable", 20, "W/ft"],
+    "BUILDING_FACADES": ["nontradable", 0.0, ""],
+    "AUTOMATED_TELLER_MACHINE": ["nontradable", 0.0, ""],
+    "NIGHT_DEPOSITORIES": ["nontradable", 0.0, ""],
+    "GATEHOUSE_INSPECTION_STATIONS": ["nontradable", 0.0, ""],
+    "LOADING_AREAS_EMERGENCY_RESPONDERS": ["nontradable", 0.0, ""],
+    "DRIVE_UP_WINDOW_FAST_FOOD": ["nontradable", 0.0, ""],
+    "PARKING_NEAR_24_HR_RETAIL_ENTRANCES": ["nontradable", 0.0, ""]}
+
+# Table G3.1.1-3
+table_g3_1_1_3 = {
+    "RESIDENTIAL": ["SYSTEM_1_PTAC", "SYSTEM_2_PTHP"],
+    "PUBLIC_ASSEMBLY_SMALL": ["SYSTEM_3_PSZ_AC", "SYSTEM_4_PSZ_HP"],
+    "PUBLIC_ASSEMBLY_LARGE": ["SYSTEM_12_SINGLE_ZONE_CONSTANT_HOT_WATER", "SYSTEM_13_SINGLE_ZONE_CONSTANT_ELECTRIC"],
+    "HEATED_ONLY_STORAGE": ["SYSTEM_9_HEATING_AND_VENTILATION_GAS", "SYSTEM_10_HEATING_AND_VENTILATION_ELECTRIC"],
+    "RETAIL_TWO_FLOOR_OR_LESS": ["SYSTEM_3_PSZ_AC", "SYSTEM_4_PSZ_HP"],
+    "OTHER_NONRESIDENTIAL_SMALL": ["SYSTEM_3_PSZ_AC", "SYSTEM_4_PSZ_HP"],
+    "OTHER_NONRESIDENTIAL_MEDIUM": ["SYSTEM_5_PACKAGED_VAV_WITH_REHEAT", "SYSTEM_6_PACKAGED_VAV_WITH_PFP_BOXES"],
+    "OTHER_NONRESIDENTIAL_LARGE": ["SYSTEM_7_VAV_WITH_REHEAT", "SYSTEM_8_VAV_WITH_PFP_BOXES"]
+}
+
+# G3.1.2.9, fan power calculation method
+section_g3_1_2_9_mapping = {
+    "SYSTEM_1_PTAC": "CFMs",
+    "SYSTEM_2_PTHP": "CFMs",
+    "SYSTEM_3_PSZ_AC": "bhp/fan motor efficiency",
+    "SYSTEM_4_PSZ_HP": "bhp/fan motor efficiency",
+    "SYSTEM_5_PACKAGED_VAV_WITH_REHEAT": "bhp/fan motor efficiency",
+    "SYSTEM_6_PACKAGED_VAV_WITH_PFP_BOXES": "bhp/fan motor efficiency",
+    "SYSTEM_7_VAV_WITH_REHEAT": "bhp/fan motor efficiency",
+    "SYSTEM_8_VAV_WITH_PFP_BOXES": "bhp/fan motor efficiency",
+    "SYSTEM_9_HEATING_AND_VENTILATION_GAS": "CFMsPlusNonMechanicalCooling",
+    "SYSTEM_10_HEATING_AND_VENTILATION_ELECTRIC": "CFMsPlusNonMechanicalCooling",
+    "SYSTEM_11_SINGLE_ZONE_VAV": "bhp/fan motor efficiency",
+    "SYSTEM_12_SINGLE_ZONE_CONSTANT_HOT_WATER": "bhp/fan motor efficiency",
+    "SYSTEM_13_SINGLE_ZONE_CONSTANT_ELECTRIC": "bhp/fan motor efficiency"
+}
+
+# Table G3.1.2.9, supply volume multipliers
+table_g3_1_2_9_mapping = {
+    "SYSTEM_3_PSZ_AC": 0.00094,
+    "SYSTEM_4_PSZ_HP": 0.00094,
+    "SYSTEM_5_PACKAGED_VAV_WITH_REHEAT": 0.0013,
+    "SYSTEM_6_PACKAGED_VAV_WITH_PFP_BOXES": 0.0013,
+    "SYSTEM_7_VAV_WITH_REHEAT": 0.0013,
+    "SYSTEM_8_VAV_WITH_PFP_BOXES": 0.0013,
+    "SYSTEM_11_SINGLE_ZONE_VAV": 0.00062,
+    "SYSTEM_12_SINGLE_ZONE_CONSTANT_HOT_WATER": 0.00094,
+    "SYSTEM_13_SINGLE_ZONE_CONSTANT_ELECTRIC": 0.00094
+}
+
+# Table G3.9.1, shaft input power to motor efficiency
+table_g3_9_1_mapping = {
+    1.0: 82.5,
+    1.5: 84.0,
+    2.0: 84.0,
+    3.0: 87.5,
+    5.0: 87.5,
+    7.5: 89.5,
+    10.0: 89.5,
+    15.0: 91.0,
+    20.0: 91.0,
+    25.0: 91.0,
+    30.0: 92.4,
+    40.0: 93.0,
+    50.0: 93.0,
+    60.0: 93.6,
+    75.0: 94.1,
+    100.0: 94.5,
+    125.0: 94.5,
+    150.0: 95.0,
+    200.0: 95.0
+}
+
+# Table G3.1.1-1
+table_g3_1_1_1 = {
+    "GROCERY_STORE": 0.07,
+    "HEALTHCARE_OUTPATIENT": 0.21,
+    "HOSPITAL": 0.27,
+    "HOTEL_LARGE": 0.24,
+    "HOTEL_SMALL": 0.34,
+    "OFFICE_SMALL": 0.19,
+    "OFFICE_MEDIUM": 0.31,
+    "OFFICE_LARGE": 0.40,
+    "RESTAURANT_QUICK_SERVICE": 0.34,
+    "RESTAURANT_FULL_SERVICE0": 0.24,
+    "RETAIL_STAND_ALONE": 0.11,
+    "RETAIL_STRIP_MALL": 0.20,
+    "SCHOOL_PRIMARY": 0.22,
+    "SCHOOL_SECONDARY_AND_UNIVERSITY": 0.22,
+    "WAREHOUSE_NON_REFRIGERATED": 0.06
+}
+
+# Table G3.4-1 to G3.4-8 by climate zone
+table_g_4_climate_zone_lookup = {
+    "0A": "0A_0B_1A_1B",
+    "0B": "0A_0B_1A_1B",
+    "1A": "0A_0B_1A_1B",
+    "1B": "0A_0B_1A_1B",
+    "2A": "2A_2B",
+    "2B": "2A_2B",
+    "3A": "3A_3B",
+    "3B": "3A_3B",
+    "3C": "3C",
+    "4A": "4A_4B_4C",
+    "4B": "4A_4B_4C",
+    "4C": "4A_4B_4C",
+    "5A": "5A_5B_5C",
+    "5B": "5A_5B_5C",
+    "5C": "5A_5B_5C",
+    "6A": "6A_6B",
+    "6B": "6A_6B",
+    "7": "7",
+    "8": "8"
+}
+
+# Tables G3.4-1 to G3.4-8 vertical fenestration
+table_g3_4_fenestration_assembly = {
+    "0A_0B_1A_1B":
+        {
+            "NONRESIDENTIAL": [
+                [0.0, 40.0, 1.22, 0.25, 0.28]   # fenestration percentage low, fenestration percentage low, U, SHGC, VT
+            ],
+            "RESIDENTIAL": [
+                [0.0, 40.0, 1.22, 0.25, 0.28]
+            ],
+            "SEMIHEATED": [
+                [0.0, 40.0, 1.22, 0.40, 0.44]
+            ]
+        },
+    "2A_2B":
+        {
+            "NONRESIDENTIAL": [
+                [0.0, 40.0, 1.22, 0.25, 0.28]
+            ],
+            "RESIDENTIAL": [
+                [0.0, 10.0, 1.22, 0.39, 0.43],
+                [10.1, 40.0, 1.22, 0.25, 0.28]
+            ],
+            "SEMIHEATED": [
+                [0.0, 40.0, 1.22, 0.40, 0.44]
+            ],
+        },
+    "3A_3B":
+        {
+            "NONRESIDENTIAL": [
+                [0.0, 10.0, 0.57, 0.39, 0.43],
+                [10.1, 40.0, 0.57, 0.25, 0.28]
+            ],
+            "RESIDENTIAL": [
+                [0.0, 20.0, 0.57, 0.39, 0.43],
+                [20.1, 40.0, 0.57, 0.25, 0.28]
+            ],
+            "SEMIHEATED": [
+                [0.0, 40.0, 1.22, 0.40, 0.44]
+            ],
+        },
+    "3C":
+        {
+            "NONRESIDENTIAL": [
+                [0.0, 10.0, 1.22, 0.61, 0.67],
+                [10.1, 30.0, 1.22, 0.39, 0.43],
+                [30.1, 40.0, 1.22, 0.34, 0.37]
+            ],
+            "RESIDENTIAL": [
+                [0.0, 20.0, 1.22, 0.61, 0.67],
+                [20.1, 30.0, 1.22, 0.39, 0.43],
+                [30.1, 40.0, 1.22, 0.34, 0.37]
+            ],
+            "SEMIHEATED": [
+                [0.0, 40.0, 1.22, 0.40, 0.44]
+            ],
+        },
+    "4A_4B_4C":
+        {
+            "NONRESIDENTIAL": [
+                [0.0, 40.0, 0.57, 0.39, 0.43]
+            ],
+            "RESIDENTIAL": [
+                [0.0, 40.0, 0.57, 0.39, 0.43]
+            ],
+            "SEMIHEATED": [
+                [0.0, 40.0, 1.22, 0.40, 0.44]
+            ],
+        },
+    "5A_5B_5C":
+        {
+            "NONRESIDENTIAL": [
+                [0.0, 10.0, 0.57, 0.49, 0.54],
+                [10.1, 40.0, 0.57, 0.39, 0.43]
+            ],
+            "RESIDENTIAL": [
+                [0.0, 10.0, 0.57, 0.49, 0.54],
+                [10.1, 40.0, 0.57, 0.39, 0.43]
+            ],
+            "SEMIHEATED": [
+                [0.0, 40.0, 1.22, 0.40, 0.44]
+            ],
+        },
+    "6A_6B":
+        {
+            "NONRESIDENTIAL": [
+                [0.0, 10.0, 0.57, 0.49, 0.54],
+                [10.1, 40.0, 0.57, 0.39, 0.43]
+            ],
+            "RESIDENTIAL": [
+                [0.0, 10.0, 0.57, 0.49, 0.54],
+                [10.1, 40.0, 0.57, 0.39, 0.43]
+            ],
+            "SEMIHEATED": [
+                [0.0, 40.0, 1.22, 0.40, 0.44]
+            ],
+        },
+    "7":
+        {
+            "NONRESIDENTIAL": [
+                [0.0, 40.0, 0.57, 0.49, 0.54]
+            ],
+            "RESIDENTIAL": [
+                [0.0, 40.0, 0.57, 0.49, 0.54]
+            ],
+            "SEMIHEATED": [
+                [0.0, 40.0, 1.22, 0.40, 0.44]
+            ],
+        },
+    "8":
+        {
+            "NONRESIDENTIAL": [
+                [0.0, 40.0, 0.46, 0.40, 0.44]
+            ],
+            "RESIDENTIAL": [
+                [0.0, 40.0, 0.46, 0.40, 0.44]
+            ],
+            "SEMIHEATED": [
+                [0.0, 40.0, 1.22, 0.40, 0.44]
+            ],
+        }
+}
+
+climate_zones_0_to_3 = frozenset(["0A", "0B", "1A", "1B", "2A", "2B", "3A", "3B", "3C"])
+
+# Table G3.9.1 as parallel sorted lists of shaft input power limits and efficiencies
+motor_power_limits = sorted(table_g3_9_1_mapping)
+motor_efficiencies = [table_g3_9_1_mapping[limit] for limit in motor_power_limits]
+
+# for each climate zone group and space conditioning category the bands sorted by their high percentage
+fenestration_band_highs = {}
+for climate_zone_group, categories in table_g3_4_fenestration_assembly.items():
+    for space_conditioning_category, criteria_options in categories.items():
+        criteria_options.sort(key=lambda criteria_option: criteria_option[1])
+        fenestration_band_highs[climate_zone_group, space_conditioning_category] = \
+            [criteria_option[1] for criteria_option in criteria_options]
+
+
+def select_motor_efficiency(brake_horse_power):
+    # the smallest shaft input power limit that is not less than the brake horsepower
+    if not brake_horse_power <= motor_power_limits[-1]:
+        return 0, 95
+    index = bisect_left(motor_power_limits, brake_horse_power)
+    return motor_power_limits[index], motor_efficiencies[index]
+
+
+def fenestration_criteria(climate_zone, space_conditioning_category, fenestration_percentage):
+    # U, SHGC and VT of the band strictly containing the percentage, otherwise of the last band
+    climate_zone_group = table_g_4_climate_zone_lookup[climate_zone]
+    criteria_options = table_g3_4_fenestration_assembly[climate_zone_group][space_conditioning_category]
+    highs = fenestration_band_highs[climate_zone_group, space_conditioning_category]
+    index = bisect_right(highs, fenestration_percentage)
+    if index < len(criteria_options) and criteria_options[index][0] < fenestration_percentage:
+        return tuple(criteria_options[index][2:])
+    return tuple(criteria_options[-1][2:])
@@ -0,0 +1,98 @@
+# Incremental validation of edited stages against validating them again in full, over random edits
+# that include resizing arrays and editing the items that moved.
+# python -m pytest makeRMR/test_incremental_validation.py
+import json
+import random
+
+import pytest
+
+from benchmark import SCHEMA_FILE_NAME, synthetic_rmr
+from rmrtriplet import RmrTriplet
+from schemavalidation import SchemaValidators, load_schema
+
+VALUES = [1, -5, "x", None, 0.5, [], {}, "OFFICE", 99999, True]
+
+
+@pytest.fixture(scope="module")
+def validator():
+    return SchemaValidators(load_schema(SCHEMA_FILE_NAME))
+
+
+@pytest.fixture(scope="module")
+def origin_file_name(tmp_path_factory):
+    file_name = str(tmp_path_factory.mktemp("origin") / "synthetic.user.json")
+    with open(file_name, "w") as origin_file:
+        json.dump(synthetic_rmr(20, 2, 6, 10), origin_file)
+    return file_name
+
+
+def error_keys(errors):
+    return [(error["path"], error["message"]) for error in errors]
+
+
+def assert_same_errors(rmr_triplet, validator):
+    incremental = rmr_triplet.validate_instances()[rmr_triplet.baseline_file_name]
+    full = validator.errors(rmr_triplet.plain_instance(rmr_triplet.baseline))
+    assert error_keys(incremental) == error_keys(full)
+
+
+def random_edit(stage, chooser):
+    building = stage.Building
+    thermal_block = building.ThermalBlocks[chooser.randrange(len(building.ThermalBlocks))]
+    hvac_systems = building.HeatingVentilationAirConditioningSystems
+    kind = chooser.randrange(10)
+    if kind == 0:
+        stage["climate_zone"] = chooser.choice(["4A", "bad", 3])
+    elif kind == 1:
+        key = chooser.choice(["floor_number", "gross_conditioned_floor_area", "building_area_type", "name", "junk"])
+        thermal_block[key] = chooser.choice(VALUES)
+    elif kind == 2:
+        exterior_above_grade_wall = thermal_block.ExteriorAboveGradeWalls[0]
+        exterior_above_grade_wall[chooser.choice(["area", "vertical_fenestration_percentage", "name"])] = chooser.choice(VALUES)
+    elif kind == 3:
+        fenestration_assembly = thermal_block.ExteriorAboveGradeWalls[0].FenestrationAssemblies[0]
+        fenestration_assembly[chooser.choice(["u_factor", "solar_heat_gain_coefficient", "x"])] = chooser.choice(VALUES)
+    elif kind == 4:
+        hvac_systems[chooser.randrange(len(hvac_systems))]["hvac_system_type"] = chooser.choice(["SYSTEM_1_PTAC", "NOPE", 4])
+    elif kind == 5:
+        if chooser.random() < 0.5:
+            building.ThermalBlocks.append({"name": "new"})
+        else:
+            building.ThermalBlocks.pop()
+    elif kind == 6:
+        if len(thermal_block.ExteriorAboveGradeWalls):
+            del thermal_block.ExteriorAboveGradeWalls[0]
+    elif kind == 7:
+        stage.ExteriorLightingAreas[chooser.randrange(len(stage.ExteriorLightingAreas))]["power"] = chooser.choice(VALUES)
+    elif kind == 8:
+        thermal_block["ExteriorAboveGradeWalls"] = chooser.choice([[], "x", [{"name": "w"}]])
+    else:
+        # an item inserted in front, then an edit of an item that moved and of the inserted one
+        hvac_systems.insert(0, dict(hvac_systems[-1]))
+        hvac_systems[chooser.randrange(1, len(hvac_systems))]["fan_brake_horsepower"] = chooser.choice(VALUES)
+        hvac_systems[0]["tag"] = chooser.choice(VALUES)
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_random_edits(validator, origin_file_name, tmp_path, seed):
+    chooser = random.Random(seed)
+    rmr_triplet = RmrTriplet(origin_file_name, str(tmp_path / "random"), validator=validator, typed=seed % 4 == 3)
+    rmr_triplet.validate_instances()
+    for step in range(12):
+        random_edit(rmr_triplet.baseline, chooser)
+        if chooser.random() < 0.5:
+            assert_same_errors(rmr_triplet, validator)
+    assert_same_errors(rmr_triplet, validator)
+
+
+def test_insert_then_edit_moved_item(validator, origin_file_name, tmp_path):
+    rmr_triplet = RmrTriplet(origin_file_name, str(tmp_path / "insert"), validator=validator)
+    assert rmr_triplet.validate_instances()[rmr_triplet.baseline_file_name] == []
+    hvac_systems = rmr_triplet.baseline.Building.HeatingVentilationAirConditioningSystems
+    hvac_systems.insert(0, dict(hvac_systems[0]))
+    hvac_systems[1].fan_brake_horsepower = "bad"
+    assert_same_errors(rmr_triplet, validator)
+    assert len(rmr_triplet.validate_instances()[rmr_triplet.baseline_file_name]) == 1
+    del hvac_systems[0]
+    hvac_systems[0].fan_brake_horsepower = 1
+    assert_same_errors(rmr_triplet, validator)
@@ -0,0 +1,70 @@
+# Declarative test cases: each one names the triplet to write, the values to set on each stage by
+# pointer ("*" matches every item or key) and the rules to check. The origin is parsed once and the
+# cases run in a pool of processes, each report is returned to be printed in the order of the cases.
+import io
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from maskeddiff import set_pointer
+from rmrtriplet import RmrTriplet, load_origin, remember_origin
+from resultcache import portable_result
+from results import TextSink
+from schemavalidation import SchemaValidators, load_schema
+
+TestCase = namedtuple("TestCase", ["triplet_root_name", "overrides", "rules"])
+
+STAGES = ("user", "proposed", "baseline")
+
+# set by init_worker in each process of the pool
+worker_origin_file_name = None
+worker_validator = None
+worker_result_cache = None
+
+
+def init_worker(origin_file_name, origin, schema_file_name, result_cache, validator=None):
+    global worker_origin_file_name, worker_validator, worker_result_cache
+    worker_origin_file_name = origin_file_name
+    remember_origin(origin_file_name, origin)
+    if validator is None and schema_file_name is not None:
+        validator = SchemaValidators(load_schema(schema_file_name))
+    worker_validator = validator
+    worker_result_cache = result_cache
+
+
+def run_test_case(test_case):
+    unknown_stages = [stage for stage in test_case.overrides if stage not in STAGES]
+    if unknown_stages:
+        raise ValueError(f"unknown stages {unknown_stages} in test case {test_case.triplet_root_name}")
+    rmr_triplet = RmrTriplet(worker_origin_file_name, test_case.triplet_root_name, validator=worker_validator,
+                             result_cache=worker_result_cache)
+    for stage in STAGES:
+        for pointer, value in test_case.overrides.get(stage, {}).items():
+            if not set_pointer(getattr(rmr_triplet, stage), pointer, value):
+                raise ValueError(f"{pointer} matches nothing in the {stage} stage of {test_case.triplet_root_name}")
+    rmr_triplet.save_instances()
+    report = io.StringIO()
+    results = rmr_triplet.check_rules(test_case.rules, sink=TextSink(report)) if test_case.rules else []
+    return {"triplet_root_name": test_case.triplet_root_name,
+            "report": report.getvalue(),
+            "proposed_err": rmr_triplet.proposed_err,
+            "baseline_err": rmr_triplet.baseline_err,
+            "validated": rmr_triplet.validated_files(),
+            "results": [portable_result(result) for result in results]}
+
+
+def run_test_cases(origin_file_name, test_cases, schema_file_name=None, result_cache=None, executor="process",
+                   max_workers=None, chunksize=8, validator=None):
+    # yields the outcome of each test case in order, executor None runs them in this process where
+    # an already built validator can be given instead of the schema file name
+    origin = load_origin(origin_file_name)
+    if executor is None:
+        init_worker(origin_file_name, origin, schema_file_name, result_cache, validator)
+        for test_case in test_cases:
+            yield run_test_case(test_case)
+    elif executor == "process":
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker,
+                                 initargs=(origin_file_name, origin, schema_file_name, result_cache)) as pool:
+            for outcome in pool.map(run_test_case, test_cases, chunksize=chunksize):
+                yield outcome
+    else:
+        raise ValueError(f"unknown executor {executor}, expected None or 'process'")
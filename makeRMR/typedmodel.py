@@ -0,0 +1,229 @@
+# Classes with __slots__ generated from the definitions of the Standard 229 schema, a compact
+# alternative to a tree of dicts for models with many walls, fenestration assemblies and systems.
+# Records keep the attribute paths and mapping behavior the rules use and remember the key order
+# they were loaded with, so dumping gives back the same document.
+import os
+import json
+from collections.abc import MutableMapping
+
+from schemavalidation import load_schema
+
+SCHEMA_FILE_NAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                                "standard229-ruleset-model-report.schema.json")
+
+# typed models by schema file name, also used to rebuild records unpickled in another process
+MODELS = {}
+
+
+def class_name(name):
+    return "".join(part[:1].upper() + part[1:] for part in name.split("_"))
+
+
+def typed_value(value, field_type):
+    # field_type is None for plain values or (record class, is array)
+    if field_type is None:
+        return value
+    record_class, is_array = field_type
+    if is_array:
+        if isinstance(value, list):
+            return [record_class.from_dict(item) if isinstance(item, dict) else item for item in value]
+        return value
+    if isinstance(value, dict):
+        return record_class.from_dict(value)
+    return value
+
+
+def plain_value(value):
+    if isinstance(value, TypedRecord):
+        return value.to_dict()
+    if isinstance(value, dict):
+        return {key: plain_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [plain_value(item) for item in value]
+    return value
+
+
+def restore_record(schema_file_name, name, items):
+    return typed_model(schema_file_name).classes[name].from_dict(items)
+
+
+class TypedRecord(MutableMapping):
+    # the schema properties are slots, other keys go to _extra and _order is the key order shared
+    # by every record of a class loaded with the same keys
+    __slots__ = ("_order", "_extra")
+    fields = frozenset()
+    field_types = {}
+    orders = {}
+    schema_file_name = None
+
+    def __init__(self, items=()):
+        object.__setattr__(self, "_order", ())
+        object.__setattr__(self, "_extra", None)
+        for key, value in dict(items).items():
+            self[key] = value
+
+    @classmethod
+    def from_dict(cls, document):
+        record = cls.__new__(cls)
+        extra = None
+        for key, value in document.items():
+            if key in cls.fields:
+                object.__setattr__(record, key, typed_value(value, cls.field_types.get(key)))
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        object.__setattr__(record, "_extra", extra)
+        object.__setattr__(record, "_order", cls.intern_order(tuple(document)))
+        return record
+
+    @classmethod
+    def intern_order(cls, order):
+        return cls.orders.setdefault(order, order)
+
+    def to_dict(self):
+        return {key: plain_value(self[key]) for key in self._order}
+
+    def __getattr__(self, name):
+        # only reached for unset slots and keys that are not schema properties
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if self._extra is not None and name in self._extra:
+            return self._extra[name]
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            self[name] = value
+
+    def __delattr__(self, name):
+        try:
+            del self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __getitem__(self, key):
+        if key in self.fields:
+            try:
+                return object.__getattribute__(self, key)
+            except AttributeError:
+                raise KeyError(key)
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in self.fields:
+            try:
+                return object.__getattribute__(self, key)
+            except AttributeError:
+                return default
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def __setitem__(self, key, value):
+        if key in self.fields:
+            object.__setattr__(self, key, typed_value(value, self.field_types.get(key)))
+        else:
+            if self._extra is None:
+                object.__setattr__(self, "_extra", {})
+            self._extra[key] = value
+        if key not in self._order:
+            object.__setattr__(self, "_order", self.intern_order(self._order + (key,)))
+
+    def __delitem__(self, key):
+        if key not in self._order:
+            raise KeyError(key)
+        if key in self.fields:
+            object.__delattr__(self, key)
+        else:
+            del self._extra[key]
+        object.__setattr__(self, "_order", self.intern_order(tuple(name for name in self._order if name != key)))
+
+    def __contains__(self, key):
+        return key in self._order
+
+    def __iter__(self):
+        return iter(self._order)
+
+    def __len__(self):
+        return len(self._order)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def __reduce__(self):
+        # generated classes cannot be found by name, so records are rebuilt from the schema file
+        return restore_record, (self.schema_file_name, type(self).__name__, {key: self[key] for key in self._order})
+
+
+class TypedModel(object):
+
+    def __init__(self, schema, schema_file_name=None):
+        self.schema = schema
+        self.schema_file_name = schema_file_name
+        # classes by name, each is created the first time the root or another class refers to it
+        self.classes = {}
+        self.root = self.record_class("ruleset_model_report", schema)
+        for definition_name, definition in schema.get("definitions", {}).items():
+            self.record_class(definition_name, definition)
+
+    def record_class(self, name, schema_node):
+        name = class_name(name)
+        if name in self.classes:
+            return self.classes[name]
+        properties = schema_node.get("properties", {})
+        reserved = set(dir(TypedRecord))
+        fields = tuple(field for field in properties if field not in reserved and not field.startswith("_"))
+        record_class = type(name, (TypedRecord,), {"__slots__": fields,
+                                                   "fields": frozenset(fields),
+                                                   "field_types": {},
+                                                   "orders": {},
+                                                   "schema_file_name": self.schema_file_name})
+        self.classes[name] = record_class
+        for field in fields:
+            field_type = self.field_type(field, properties[field])
+            if field_type is not None:
+                record_class.field_types[field] = field_type
+        return record_class
+
+    def field_type(self, field, property_schema):
+        if "$ref" in property_schema:
+            return self.referenced_class(property_schema["$ref"]), False
+        if property_schema.get("type") == "object" and "properties" in property_schema:
+            return self.record_class(field, property_schema), False
+        if property_schema.get("type") == "array":
+            items = property_schema.get("items", {})
+            if "$ref" in items:
+                return self.referenced_class(items["$ref"]), True
+            if items.get("type") == "object" and "properties" in items:
+                return self.record_class(field + "_item", items), True
+        return None
+
+    def referenced_class(self, reference):
+        definition_name = reference.split("/")[-1]
+        return self.record_class(definition_name, self.schema["definitions"][definition_name])
+
+    def load(self, document):
+        return self.root.from_dict(document)
+
+    def load_file(self, file_name):
+        with open(file_name, "r") as instance_file:
+            return self.load(json.load(instance_file))
+
+    def dump(self, record):
+        return plain_value(record)
+
+    def dump_file(self, record, file_name, indent=2):
+        with open(file_name, "w") as instance_file:
+            json.dump(self.dump(record), instance_file, indent=indent)
+
+
+def typed_model(schema_file_name=SCHEMA_FILE_NAME):
+    # built once for each schema file
+    if schema_file_name not in MODELS:
+        MODELS[schema_file_name] = TypedModel(load_schema(schema_file_name), schema_file_name)
+    return MODELS[schema_file_name]
@@ -0,0 +1,83 @@
+import os
+import re
+import sys
+import copy
+import json
+import time
+import hashlib
+import tempfile
+import subprocess
+import importlib.util
+import fastjsonschema
+
+from instancewriter import write_file
+
+# generated validator modules are kept here, an empty RMR_VALIDATOR_CACHE_DIR turns the cache off
+DEFAULT_CACHE_DIR = os.environ.get("RMR_VALIDATOR_CACHE_DIR",
+                                   os.path.join(os.path.dirname(os.path.abspath(__file__)), ".validator_cache"))
+
+
+def schema_key(schema, fast_fail=True):
+    schema_text = json.dumps(schema, sort_keys=True, separators=(",", ":"))
+    options = f"fast_fail={fast_fail}"
+    return hashlib.sha256((fastjsonschema.VERSION + "\n" + options + "\n" + schema_text).encode("utf-8")).hexdigest()
+
+
+def compile_cached(schema, cache_dir=DEFAULT_CACHE_DIR, fast_fail=True):
+    # fastjsonschema rewrites the $refs of the schema it compiles, it is given a copy so the schema
+    # and the keys of the schemas sharing its definitions stay the same
+    if not cache_dir:
+        return fastjsonschema.compile(copy.deepcopy(schema), fast_fail=fast_fail)
+    module_name = "rmr_validator_" + schema_key(schema, fast_fail)
+    module_file_name = os.path.join(cache_dir, module_name + ".py")
+    if not os.path.exists(module_file_name):
+        write_validator_module(schema, cache_dir, module_file_name, fast_fail)
+    try:
+        return load_validator_module(module_name, module_file_name)
+    except (ImportError, SyntaxError, AttributeError):
+        # a damaged cache entry is rebuilt once
+        write_validator_module(schema, cache_dir, module_file_name, fast_fail)
+        return load_validator_module(module_name, module_file_name)
+
+
+def write_validator_module(schema, cache_dir, module_file_name, fast_fail=True):
+    code = fastjsonschema.compile_to_code(copy.deepcopy(schema), fast_fail=fast_fail)
+    # the first generated function validates the whole schema
+    entry_name = re.search(r"^def (\w+)\(", code, re.MULTILINE).group(1)
+    code += f"\n\nvalidate = {entry_name}\n"
+    os.makedirs(cache_dir, exist_ok=True)
+    # written then renamed so pool workers starting together never import a partial file
+    write_file(module_file_name, code.encode("utf-8"), atomic=True)
+
+
+def load_validator_module(module_name, module_file_name):
+    spec = importlib.util.spec_from_file_location(module_name, module_file_name)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.validate
+
+
+def time_startup(schema_file_name, cache_dir, runs=5):
+    # wall time of fresh interpreters building all validators, like a short lived job or pool worker
+    code = ("from schemavalidation import SchemaValidators, load_schema; "
+            f"SchemaValidators(load_schema({schema_file_name!r}))")
+    environment = dict(os.environ, RMR_VALIDATOR_CACHE_DIR=cache_dir)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True, env=environment,
+                       cwd=os.path.dirname(os.path.abspath(__file__)))
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+if __name__ == '__main__':
+    schema_file_name = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                                    "standard229-ruleset-model-report.schema.json")
+    with tempfile.TemporaryDirectory() as benchmark_cache_dir:
+        uncached = time_startup(schema_file_name, "")
+        first_run = time_startup(schema_file_name, benchmark_cache_dir, runs=1)
+        cached = time_startup(schema_file_name, benchmark_cache_dir)
+    print(f"startup without cache:      {min(uncached) * 1000:.1f} ms (best of {len(uncached)})")
+    print(f"startup filling the cache:  {first_run[0] * 1000:.1f} ms")
+    print(f"startup with a warm cache:  {min(cached) * 1000:.1f} ms (best of {len(cached)})")